@@ -0,0 +1,80 @@
+# Recall@k and query latency of the ANN index kinds against the exact flat baseline.
+#   python benchmarks/bench_ann.py                      # synthetic clustered vectors
+#   python benchmarks/bench_ann.py --cache-model text-embedding-ada-002   # vectors from the embedding cache
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smr_pipeline.embedding_store import EmbeddingStore
+from smr_pipeline.vector_index import build_index, set_search_params
+
+# (kind, build kwargs, list of search settings to sweep)
+CONFIGS = [
+    ("flat", {}, [{}]),
+    ("fp16", {}, [{}]),
+    ("sq8", {}, [{}]),
+    ("ivf", {}, [{"nprobe": p} for p in (1, 4, 16, 64)]),
+    ("hnsw", {"hnsw_m": 32}, [{"ef_search": ef} for ef in (16, 64, 256)]),
+    ("ivfpq", {}, [{"nprobe": p} for p in (4, 16, 64)]),
+]
+
+
+def synthetic_vectors(n, dim, clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, dim)).astype("float32")
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+
+
+def run(vectors, queries, k):
+    exact = build_index(vectors, kind="flat")
+    _, truth = exact.search(queries, k)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={k}")
+    print(f"{'index':<8}{'setting':<16}{'build s':>9}{'recall':>9}{'ms/query':>10}{'MB':>9}")
+    for kind, build_kwargs, settings in CONFIGS:
+        start = time.perf_counter()
+        index = build_index(vectors, kind=kind, **build_kwargs)
+        build_time = time.perf_counter() - start
+        size_mb = _index_bytes(index) / 1e6
+        for setting in settings:
+            set_search_params(index, **setting)
+            start = time.perf_counter()
+            _, found = index.search(queries, k)
+            latency = (time.perf_counter() - start) / len(queries)
+            label = ", ".join(f"{key}={value}" for key, value in setting.items()) or "-"
+            print(f"{kind:<8}{label:<16}{build_time:>9.2f}{recall_at_k(found, truth):>9.3f}"
+                  f"{latency * 1000:>10.3f}{size_mb:>9.1f}")
+
+
+def _index_bytes(index):
+    import faiss
+    return len(faiss.serialize_index(index))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--cache-model", help="benchmark the vectors cached for this embedding model")
+    args = parser.parse_args()
+
+    if args.cache_model:
+        vectors = np.array(EmbeddingStore(args.cache_model).matrix())
+    else:
+        vectors = synthetic_vectors(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype("float32")
+    run(vectors, np.ascontiguousarray(queries, dtype="float32"), args.k)
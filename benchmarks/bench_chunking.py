@@ -0,0 +1,83 @@
+# Chunk-length distribution and chunking throughput on scraped_smr_sources.csv,
+# comparing the shared token-aware chunker with the two per-script chunkers it replaced.
+#   python benchmarks/bench_chunking.py
+#   python benchmarks/bench_chunking.py --max-tokens 128 --overlap 16 --boundary paragraph --tokenizer regex
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fixtures import CORPUS_CSV
+from smr_pipeline.chunking import BOUNDARIES, DEFAULT_MAX_TOKENS, DEFAULT_OVERLAP, Chunker
+
+
+# scrapechunk's original splitter: "." separated, 500-character budget
+def legacy_char_chunks(text, max_chunk_size=500):
+    chunks = []
+    current_chunk = ""
+    for sentence in text.split("."):
+        if len(current_chunk) + len(sentence) < max_chunk_size:
+            current_chunk += sentence + "."
+        else:
+            chunks.append(current_chunk)
+            current_chunk = sentence + "."
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+# "streamlit_app copy.py"'s original splitter: ". " separated, 500-word budget
+def legacy_word_chunks(text, max_tokens=500):
+    chunks = []
+    current_chunk = ""
+    for sentence in text.split(". "):
+        if len(current_chunk.split()) + len(sentence.split()) <= max_tokens:
+            current_chunk += sentence + ". "
+        else:
+            chunks.append(current_chunk.strip())
+            current_chunk = sentence + ". "
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+    return chunks
+
+
+def load_documents(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row.get("content") or "" for row in csv.DictReader(f)]
+
+
+def run(documents, chunker, repeat):
+    chunkers = {
+        "legacy chars (500)": legacy_char_chunks,
+        "legacy words (500)": legacy_word_chunks,
+        f"shared ({chunker.signature})": lambda text: [chunk for _, chunk in chunker(text)],
+    }
+    count = chunker.tokenizer.count
+    size = sum(len(text.encode("utf-8")) for text in documents)
+    print(f"{len(documents)} documents, {size / 1024:.0f} KiB, tokens counted with {chunker.tokenizer.name}, {repeat} repeats")
+    print(f"{'chunker':<36}{'chunks':>8}{'p50 tok':>9}{'p95 tok':>9}{'max tok':>9}{'MB/s':>8}{'chunks/s':>10}")
+    for name, chunk in chunkers.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            chunks = [c for text in documents for c in chunk(text)]
+        elapsed = (time.perf_counter() - start) / repeat
+        lengths = np.array([count(c) for c in chunks] or [0])
+        print(f"{name:<36}{len(chunks):>8}{np.percentile(lengths, 50):>9.0f}{np.percentile(lengths, 95):>9.0f}"
+              f"{lengths.max():>9}{size / elapsed / 1e6:>8.2f}{len(chunks) / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default=CORPUS_CSV)
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP)
+    parser.add_argument("--boundary", choices=BOUNDARIES, default="sentence")
+    parser.add_argument("--tokenizer", help="'regex' or a tiktoken encoding name")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(load_documents(args.csv), Chunker(args.max_tokens, args.overlap, args.boundary, args.tokenizer), args.repeat)
@@ -0,0 +1,104 @@
+# Memory and recall of compact, memory-mapped vector storage against the float32 IndexFlatL2 path.
+# Each saved index is loaded in a fresh process so its memory is measured in isolation: private (anonymous)
+# memory is what every Streamlit worker pays again, file-backed pages are shared between workers.
+#   python benchmarks/bench_compact.py --n 100000 --dim 1536
+#   python benchmarks/bench_compact.py --cache-model text-embedding-ada-002
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.bench_ann import recall_at_k, synthetic_vectors
+from smr_pipeline.embedding_store import EmbeddingStore
+from smr_pipeline.vector_index import build_index, load_index, save_index
+
+# (label, index kind, memory-mapped)
+CONFIGS = [
+    ("float32 flat (current)", "flat", False),
+    ("float32 flat, mmap", "flat", True),
+    ("fp16, mmap", "fp16", True),
+    ("sq8, mmap", "sq8", True),
+]
+
+
+def _memory_mb():
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields.get("RssAnon", 0.0), fields.get("RssFile", 0.0)
+
+
+# Runs in the child process: load one index, search, report memory growth, recall and latency
+def probe(path, mmap, queries_path, truth_path):
+    queries, truth = np.load(queries_path), np.load(truth_path)
+    anon_before, file_before = _memory_mb()
+    index = load_index(path, {}, mmap=mmap)
+    start = time.perf_counter()
+    _, found = index.search(queries, truth.shape[1])
+    latency = (time.perf_counter() - start) / len(queries)
+    anon_after, file_after = _memory_mb()
+    print(json.dumps({"private_mb": anon_after - anon_before, "shared_mb": file_after - file_before,
+                      "recall": recall_at_k(found, truth), "ms_per_query": latency * 1000}))
+
+
+def run(vectors, queries, k):
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = build_index(vectors, kind="flat")
+        _, truth = exact.search(queries, k)
+        del exact
+        queries_path, truth_path = os.path.join(tmp, "queries.npy"), os.path.join(tmp, "truth.npy")
+        np.save(queries_path, queries)
+        np.save(truth_path, truth)
+
+        print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={k}; "
+              f"float32 vectors alone are {vectors.nbytes / 1e6:.0f} MB")
+        print(f"{'storage':<24}{'file MB':>9}{'private MB':>12}{'shared MB':>11}{'recall':>8}{'ms/query':>10}")
+        paths = {}
+        for label, kind, mmap in CONFIGS:
+            if kind not in paths:
+                paths[kind] = os.path.join(tmp, f"{kind}.faiss")
+                save_index(build_index(vectors, kind=kind), paths[kind], {"kind": kind})
+            output = subprocess.run(
+                [sys.executable, __file__, "--probe", paths[kind], "--probe-queries", queries_path,
+                 "--probe-truth", truth_path] + (["--mmap"] if mmap else []),
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{label:<24}{os.path.getsize(paths[kind]) / 1e6:>9.1f}{result['private_mb']:>12.1f}"
+                  f"{result['shared_mb']:>11.1f}{result['recall']:>8.3f}{result['ms_per_query']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=50000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--cache-model", help="benchmark the vectors cached for this embedding model")
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--probe-queries", help=argparse.SUPPRESS)
+    parser.add_argument("--probe-truth", help=argparse.SUPPRESS)
+    parser.add_argument("--mmap", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe(args.probe, args.mmap, args.probe_queries, args.probe_truth)
+        sys.exit()
+    if args.cache_model:
+        vectors = np.array(EmbeddingStore(args.cache_model).matrix(), dtype="float32")
+    else:
+        vectors = synthetic_vectors(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype("float32")
+    run(vectors, np.ascontiguousarray(queries, dtype="float32"), args.k)
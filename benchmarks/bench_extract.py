@@ -0,0 +1,63 @@
+# Compare HTML extractors on speed and output size over the saved HTML fixtures.
+#   python benchmarks/bench_extract.py                 # the recorded fixtures (synthetic ones if none are recorded)
+#   python benchmarks/bench_extract.py --record crawl_state.db   # record real snapshots first
+
+import argparse
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fixtures import describe_html_fixtures, html_fixtures, record_html_fixtures
+from smr_pipeline.extract import available_backends, extract_text
+
+
+# The smart scraper's original html.parser + find_all(['p', 'div']) extraction, for reference
+def baseline_extract(page):
+    soup = BeautifulSoup(page, "html.parser")
+    article = soup.find("article")
+    if article:
+        text = article.get_text(separator="\n")
+    else:
+        text = "\n".join([p.get_text() for p in soup.find_all(["p", "div"]) if p.get_text()])
+    headline = soup.find("h1")
+    return ((headline.get_text() if headline else "") + "\n" + text.strip())[:10000]
+
+
+def duplicate_ratio(text):
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return 1 - len(set(lines)) / len(lines) if lines else 0.0
+
+
+def run(pages, repeat, fixtures):
+    extractors = {"baseline (bs4 p+div)": baseline_extract}
+    for backend in available_backends():
+        extractors[backend] = lambda page, backend=backend: extract_text(page, backend=backend, max_chars=10000)
+
+    print(f"{fixtures}, {repeat} repeats")
+    print(f"{'extractor':<22}{'ms/page':>10}{'chars/page':>12}{'dup lines':>11}")
+    for name, extract in extractors.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            outputs = [extract(page) for page in pages]
+        elapsed = (time.perf_counter() - start) / (repeat * len(pages))
+        chars = sum(len(text) for text in outputs) / len(pages)
+        dups = sum(duplicate_ratio(text) for text in outputs) / len(pages)
+        print(f"{name:<22}{elapsed * 1000:>10.2f}{chars:>12.0f}{dups:>10.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", metavar="STATE_DB", help="download snapshots listed in a crawl state database")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if args.record:
+        record_html_fixtures(args.record)
+    paths = html_fixtures()
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    run(pages, args.repeat, describe_html_fixtures(paths))
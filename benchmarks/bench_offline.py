@@ -0,0 +1,310 @@
+# Offline end-to-end benchmark: the scrapers against a local Wayback Machine (fake_wayback.py), knowledge-base
+# indexing and the full "Run Full Agent Analysis" flow against a local OpenAI API (fake_openai.py) and an
+# SMTP sink (smtp_sink.py). Each stage runs in a fresh process in a scratch directory and records its spans
+# (smr_pipeline.telemetry); wall time, throughput and per-span p50/p95 go to a JSON report, and --compare
+# prints the change against an earlier report.
+#   python benchmarks/bench_offline.py --report before.json
+#   python benchmarks/bench_offline.py --sites 500 --docs 5000 --runs 10 --ttft 0.5 --compare before.json
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.fake_openai import FakeOpenAI
+from benchmarks.fake_wayback import FakeWayback
+from benchmarks.fixtures import describe_html_fixtures, synthesise_corpus
+from benchmarks.smtp_sink import SmtpSink
+
+# name -> (script, CSV it writes)
+SCRAPERS = {
+    "scraper": ("scrapers/scraper_20smr_sources2.py", "scraped_smr_sources.csv"),
+    "smartscraper": ("scrapers/smartscraper_20smr_sources.py", "smartscrape_smr_sources.csv"),
+}
+# index and agents share a directory, so the analysis runs against the index the index stage built
+STAGES = [f"scrape:{name}" for name in SCRAPERS] + ["index", "agents"]
+SECRETS = {"OPENAI_API_KEY": "sk-offline-benchmark", "EMAIL_SENDER": "bench@example.com", "EMAIL_PASSWORD": "unused",
+           "EMAIL_RECIPIENT": "review@example.com", "SMTP_SERVER": "127.0.0.1", "SMTP_STARTTLS": False,
+           "SMTP_LOGIN": False}
+FORM = {"Project Name": "Offline benchmark project {run}", "Location": "Idaho Falls, ID", "Your Name": "Benchmark",
+        "Your Contact Email": "bench-user@example.com"}
+READY_TIMEOUT = 1800
+# Settings that would send a child's state or metrics outside its scratch directory
+ISOLATED_ENV = ("TELEMETRY_PROMETHEUS_PATH", "JOB_QUEUE_PATH", "CHUNK_STORE_PATH", "EMBEDDING_CACHE_DIR")
+
+
+def _rows(csv_path):
+    import csv
+
+    csv.field_size_limit(sys.maxsize)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+# Child stages: each runs in its scratch directory with the stand-ins' addresses in its environment
+# and prints its result as the last line of output
+
+def scrape_stage(name, sites, rate_limit):
+    import importlib.util
+    from smr_pipeline.fetch import HostRateLimiter
+
+    script, output = SCRAPERS[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.urls = (module.urls + [f"https://source{i:05d}.example.org" for i in range(sites)])[:sites]
+    # Every request goes to the one local host; --rate-limit spaces them the way archive.org requests are
+    module.fetcher.limiter = HostRateLimiter(default_interval=1.0) if rate_limit else HostRateLimiter(0.0, 0.0)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        module.main()
+    return {"seconds": time.perf_counter() - start, "items": sites, "unit": "sites", "rows": _rows(output)}
+
+
+# Secrets go in the directory's .streamlit/secrets.toml, where the app's background loader can read them too
+def write_secrets(app_dir, smtp_port):
+    os.makedirs(os.path.join(app_dir, ".streamlit"), exist_ok=True)
+    with open(os.path.join(app_dir, ".streamlit", "secrets.toml"), "w", encoding="utf-8") as f:
+        for key, value in {**SECRETS, "SMTP_PORT": smtp_port}.items():
+            f.write(f"{key} = {json.dumps(value)}\n")
+
+
+def _app():
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=READY_TIMEOUT)
+
+
+# Rerun the script until the sidebar reports the background knowledge-base build finished; returns its seconds
+def _wait_ready(app):
+    deadline = time.monotonic() + READY_TIMEOUT
+    while True:
+        app.run()
+        for element in app.sidebar.success:
+            match = re.search(r"Knowledge base ready \(([\d.]+)s\)", element.value)
+            if match:
+                return float(match.group(1))
+        for element in app.sidebar.error:
+            raise RuntimeError(element.value)
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Knowledge base not ready after {READY_TIMEOUT}s")
+        time.sleep(0.5)
+
+
+# Rerun the script until the submitted analysis job finishes (the page only polls it); returns any errors shown
+def _wait_job(app):
+    deadline = time.monotonic() + READY_TIMEOUT
+    while True:
+        app.run()
+        errors = [str(e.value) for e in app.exception] + [e.value for e in app.main.error]
+        if errors or any("emailed" in element.value for element in app.main.success):
+            return errors
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Analysis job not finished after {READY_TIMEOUT}s")
+        time.sleep(0.2)
+
+
+def index_stage():
+    from smr_pipeline.chunk_store import ChunkStore
+
+    start = time.perf_counter()
+    build_seconds = _wait_ready(_app())
+    return {"seconds": time.perf_counter() - start, "build_seconds": build_seconds,
+            "items": len(ChunkStore().column("id")), "unit": "chunks", "sources": _rows("scraped_smr_sources.csv")}
+
+
+def agents_stage(runs):
+    app = _app()
+    start = time.perf_counter()
+    app.run()
+    first_paint = time.perf_counter() - start
+    _wait_ready(app)
+    ready = time.perf_counter() - start
+
+    run_seconds, errors = [], []
+    for run in range(runs):
+        # A new project name each run, so every prompt misses the response cache
+        inputs = {element.label: element for element in app.text_input}
+        for label, value in FORM.items():
+            inputs[label].input(value.format(run=run))
+        button = next(element for element in app.button if element.label == "Run Full Agent Analysis")
+        run_start = time.perf_counter()
+        button.click().run()
+        errors += _wait_job(app)
+        run_seconds.append(time.perf_counter() - run_start)
+    return {"seconds": sum(run_seconds), "items": runs, "unit": "runs", "first_paint_seconds": first_paint,
+            "ready_seconds": ready, "run_p50_seconds": statistics.median(run_seconds),
+            "run_max_seconds": max(run_seconds), "errors": errors}
+
+
+def child(stage, args):
+    if stage.startswith("scrape:"):
+        result = scrape_stage(stage.split(":", 1)[1], args.sites, args.rate_limit)
+    elif stage == "index":
+        result = index_stage()
+    else:
+        result = agents_stage(args.runs)
+    print(json.dumps(result))
+    # Don't wait on the app's worker and loader threads
+    sys.stdout.flush()
+    os._exit(0)
+
+
+# Parent: stand-ins, one child process per stage, report
+
+def run_stage(stage, stage_dir, env, args):
+    spans_path = os.path.join(stage_dir, f"spans-{stage.replace(':', '-')}.jsonl")
+    command = [sys.executable, os.path.abspath(__file__), "--child", stage, "--sites", str(args.sites),
+               "--runs", str(args.runs)] + (["--rate-limit"] if args.rate_limit else [])
+    process = subprocess.run(command, cwd=stage_dir, env={**env, "TELEMETRY_PATH": spans_path},
+                             capture_output=True, text=True)
+    if process.returncode:
+        sys.exit(f"Stage {stage} failed:\n{process.stderr[-3000:]}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    if os.path.exists(spans_path):
+        from smr_pipeline.telemetry import Tracer
+
+        result["spans"] = Tracer.from_jsonl(spans_path).summary()
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    wayback = FakeWayback(latency=args.wayback_latency).start()
+    openai_server = FakeOpenAI(embed_latency=args.embed_latency, embed_item_latency=args.embed_item_latency,
+                               ttft=args.ttft, token_interval=args.token_interval,
+                               completion_tokens=args.completion_tokens).start()
+    sink = SmtpSink(handshake_latency=args.smtp_latency).start()
+    env = {key: value for key, value in os.environ.items() if key not in ISOLATED_ENV}
+    env.update(wayback.env, OPENAI_BASE_URL=openai_server.url, OPENAI_API_KEY=SECRETS["OPENAI_API_KEY"])
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "config": {key: getattr(args, key) for key in ("sites", "docs", "runs", "rate_limit", "wayback_latency",
+                                                       "embed_latency", "embed_item_latency", "ttft",
+                                                       "token_interval", "completion_tokens", "smtp_latency")}
+                  | {"html_fixtures": describe_html_fixtures(wayback.fixtures)},
+        "stages": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="smr-offline-")
+    try:
+        app_dir = os.path.join(workdir, "app")
+        os.makedirs(app_dir)
+        synthesise_corpus(os.path.join(app_dir, "scraped_smr_sources.csv"), args.docs)
+        write_secrets(app_dir, sink.port)
+        for stage in args.stages:
+            print(f"Running {stage}...", flush=True)
+            stage_dir = os.path.join(workdir, stage.replace(":", "-")) if stage.startswith("scrape:") else app_dir
+            os.makedirs(stage_dir, exist_ok=True)
+            report["stages"][stage] = run_stage(stage, stage_dir, env, args)
+    finally:
+        if args.keep:
+            print(f"Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report["stand_ins"] = {
+        "wayback": {"requests": wayback.requests, "bytes": wayback.bytes_served},
+        "openai": dict(openai_server.stats),
+        "smtp": {"messages": len(sink.messages), "connections": sink.connections},
+    }
+    return report
+
+
+def print_report(report):
+    print(f"\n{'stage':<22}{'wall s':>9}{'items':>8}{'items/s':>10}")
+    for stage, result in report["stages"].items():
+        rate = result["items"] / result["seconds"] if result["seconds"] else 0.0
+        print(f"{stage:<22}{result['seconds']:>9.2f}{result['items']:>8} {result['unit']:<6}{rate:>8.1f}")
+    agents = report["stages"].get("agents")
+    if agents:
+        print(f"analysis: first paint {agents['first_paint_seconds']:.2f}s, ready {agents['ready_seconds']:.2f}s, "
+              f"run p50 {agents['run_p50_seconds']:.2f}s, max {agents['run_max_seconds']:.2f}s, "
+              f"errors: {len(agents['errors'])}")
+    for stage, result in report["stages"].items():
+        print(f"\n{stage} spans")
+        print(f"{'span':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, span in result.get("spans", {}).items():
+            print(f"{name:<22}{span['count']:>7}{span['errors']:>8}{span['p50_ms']:>10.1f}{span['p95_ms']:>10.1f}")
+    print(f"\nstand-ins: {json.dumps(report['stand_ins'])}")
+
+
+def _change(before, after):
+    if not before:
+        return ""
+    return f"{(after - before) / before:+.0%}"
+
+
+def print_comparison(before, after):
+    if before["config"] != after["config"]:
+        changed = {key: (before["config"].get(key), value) for key, value in after["config"].items()
+                   if before["config"].get(key) != value}
+        print(f"\nNote: configurations differ: {changed}")
+    print(f"\nCompared with {before.get('commit')} ({before['created']})")
+    print(f"{'stage / span':<34}{'before':>10}{'after':>10}{'change':>9}")
+    for stage, result in after["stages"].items():
+        old = before["stages"].get(stage)
+        if old is None:
+            continue
+        print(f"{stage + ' wall s':<34}{old['seconds']:>10.2f}{result['seconds']:>10.2f}"
+              f"{_change(old['seconds'], result['seconds']):>9}")
+        for name, span in result.get("spans", {}).items():
+            old_span = old.get("spans", {}).get(name)
+            if old_span is None:
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                print(f"{'  ' + name + ' ' + key:<34}{old_span[key]:>10.1f}{span[key]:>10.1f}"
+                      f"{_change(old_span[key], span[key]):>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--sites", type=int, default=100, help="sites each scraper crawls")
+    parser.add_argument("--docs", type=int, default=500, help="sources in the corpus that gets indexed")
+    parser.add_argument("--runs", type=int, default=3, help="full agent analyses to run")
+    parser.add_argument("--rate-limit", action="store_true", help="keep archive.org politeness delays")
+    parser.add_argument("--wayback-latency", type=float, default=0.05, help="seconds per Wayback response")
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="seconds per embeddings request")
+    parser.add_argument("--embed-item-latency", type=float, default=0.001, help="extra seconds per embedded input")
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds to the first chat token")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="seconds between chat tokens")
+    parser.add_argument("--completion-tokens", type=int, default=150)
+    parser.add_argument("--smtp-latency", type=float, default=0.2, help="seconds before the SMTP greeting")
+    parser.add_argument("--report", default="offline_report.json", help="where to write the JSON report")
+    parser.add_argument("--compare", metavar="REPORT", help="an earlier report to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args)
+
+    report = run(args)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(json.load(f), report)
+    print(f"\nReport written to {args.report}")
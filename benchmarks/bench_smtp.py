@@ -0,0 +1,67 @@
+# Send latency for a burst of report emails: a new connection per message (the old behaviour)
+# against MailDelivery's persistent connection, both against the local SMTP sink.
+#   python benchmarks/bench_smtp.py --messages 50 --handshake-latency 0.2 --concurrency 8
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.smtp_sink import SmtpSink
+from smr_pipeline.mailer import MailDelivery, SmtpSettings, report_message, send_message
+
+
+def messages(n, attachment_size):
+    attachment = os.urandom(attachment_size)
+    return [
+        report_message("sender@example.com", f"user{i}@example.com", f"AI Project Review: Project {i}", "Hello,\n\nAttached.",
+                       attachment=attachment, attachment_name=f"Project_{i}_AI_Plan.pdf", cc="review@example.com")
+        for i in range(n)
+    ]
+
+
+def run_burst(send, msgs, concurrency):
+    latencies = []
+
+    def timed(msg):
+        start = time.perf_counter()
+        send(msg)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, msgs))
+    return time.perf_counter() - start, np.array(latencies) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4, help="job workers sending at once")
+    parser.add_argument("--attachment-kb", type=int, default=40)
+    parser.add_argument("--handshake-latency", type=float, default=0.2, help="simulated TLS + login cost (s)")
+    parser.add_argument("--command-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    msgs = messages(args.messages, args.attachment_kb * 1024)
+    print(f"{args.messages} messages, {args.attachment_kb} KiB attachments, concurrency {args.concurrency}, "
+          f"handshake {args.handshake_latency * 1000:.0f} ms")
+    print(f"{'mode':<24}{'total s':>9}{'p50 ms':>9}{'p95 ms':>9}{'connections':>13}")
+    for name in ("connection per message", "MailDelivery"):
+        sink = SmtpSink(handshake_latency=args.handshake_latency, command_latency=args.command_latency).start()
+        settings = SmtpSettings("127.0.0.1", sink.port, starttls=False)
+        if name == "MailDelivery":
+            delivery = MailDelivery(settings)
+            total, latencies = run_burst(delivery.send, msgs, args.concurrency)
+            delivery.close()
+        else:
+            total, latencies = run_burst(lambda msg: send_message(settings, msg), msgs, args.concurrency)
+        assert len(sink.messages) == args.messages, f"sink received {len(sink.messages)} of {args.messages}"
+        print(f"{name:<24}{total:>9.2f}{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 95):>9.1f}"
+              f"{sink.connections:>13}")
+        sink.shutdown()
+        sink.server_close()
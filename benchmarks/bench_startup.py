@@ -0,0 +1,77 @@
+# Time to first paint of streamlit_app.py in a fresh interpreter, and which heavy modules it pulled in.
+# The first script run should finish without waiting for the knowledge base, which loads in the background.
+#   python benchmarks/bench_startup.py                  # report
+#   python benchmarks/bench_startup.py --max-seconds 3  # also fail when first paint regresses past 3s
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("faiss", "fpdf", "sentence_transformers", "torch", "openai")
+DUMMY_SECRETS = {"OPENAI_API_KEY": "sk-startup-benchmark", "EMAIL_SENDER": "sender@example.com",
+                 "EMAIL_PASSWORD": "unused", "EMAIL_RECIPIENT": "review@example.com"}
+
+
+# Runs in the child process, from a scratch working directory holding a copy of the corpus CSV
+def first_paint():
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    framework = time.perf_counter() - start
+    app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120)
+    for key, value in DUMMY_SECRETS.items():
+        app.secrets[key] = value
+    start = time.perf_counter()
+    app.run()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "streamlit_import_s": framework,
+        "first_paint_s": elapsed,
+        "widgets": len(app.text_input) + len(app.multiselect) + len(app.button),
+        "exception": [str(e.value) for e in app.exception],
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+    # Don't wait for the background build (it may need the network) before exiting
+    os._exit(0)
+
+
+def run(repeat):
+    results = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as work:
+            shutil.copy(os.path.join(ROOT, "scraped_smr_sources.csv"), work)
+            env = {**os.environ, "OPENAI_BASE_URL": os.environ.get("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")}
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], cwd=work, env=env,
+                                    check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, help="exit non-zero if median first paint exceeds this")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        first_paint()
+
+    results = run(args.repeat)
+    paints = [r["first_paint_s"] for r in results]
+    paint = statistics.median(paints)
+    imports = statistics.median(r["streamlit_import_s"] for r in results)
+    print(f"{args.repeat} cold starts: streamlit import {imports:.2f}s, first paint {paint:.2f}s median "
+          f"({', '.join(f'{p:.2f}' for p in paints)})")
+    print(f"widgets rendered: {results[-1]['widgets']}; exceptions: {results[-1]['exception'] or 'none'}")
+    # The background build starts importing as soon as the script does, so this is an upper bound
+    print(f"heavy modules imported by first paint, including by the background build so far: "
+          f"{', '.join(results[-1]['heavy_modules']) or 'none'}")
+    if args.max_seconds is not None and paint > args.max_seconds:
+        sys.exit(f"First paint {paint:.2f}s exceeds the {args.max_seconds:.2f}s budget")
@@ -0,0 +1,151 @@
+# Local stand-in for the OpenAI embeddings and chat completions endpoints, with configurable latency.
+# Embeddings are deterministic unit vectors seeded by each input's text; chat completions stream a
+# canned analysis token by token after a time-to-first-token delay and report usage when asked.
+#   python benchmarks/fake_openai.py --port 8091 --ttft 0.4 --token-interval 0.02
+# then run the app or the scrapers with OPENAI_BASE_URL=http://127.0.0.1:8091/v1
+
+import argparse
+import base64
+import hashlib
+import http.server
+import json
+import threading
+import time
+
+import numpy as np
+
+ANSWER = ("Key risks: permitting delays, supply chain constraints for HALEU fuel, grid interconnection queues and "
+          "local opposition. Mitigation: phase construction, secure fuel offtake early, engage regulators and the "
+          "community before site selection, and partner with utilities that hold interconnection rights. ")
+
+
+def _tokens(text):
+    return max(1, len(text.split()))
+
+
+def embed(text, dim):
+    seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+    vector = np.random.default_rng(seed).standard_normal(dim).astype("float32")
+    return vector / np.linalg.norm(vector)
+
+
+class _OpenAIHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.endswith("/embeddings"):
+            self.embeddings(body)
+        elif self.path.endswith("/chat/completions"):
+            self.chat(body)
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown endpoint {self.path}", "type": "invalid_request_error"}})
+
+    def embeddings(self, body):
+        server = self.server
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        server.count("embedding_requests", "embedding_inputs", len(inputs))
+        time.sleep(server.embed_latency + server.embed_item_latency * len(inputs))
+        # The openai client asks for base64-packed float32 unless told otherwise
+        packed = body.get("encoding_format") == "base64"
+        data = [{"object": "embedding", "index": i, "embedding": base64.b64encode(vector.tobytes()).decode() if packed
+                 else vector.tolist()} for i, vector in enumerate(embed(text, server.dim) for text in inputs)]
+        tokens = sum(_tokens(text) for text in inputs)
+        self.send_json(200, {"object": "list", "data": data, "model": body.get("model"),
+                             "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def chat(self, body):
+        server = self.server
+        prompt_tokens = sum(_tokens(message.get("content") or "") for message in body.get("messages", []))
+        words = (ANSWER * (server.completion_tokens // _tokens(ANSWER) + 1)).split()[:server.completion_tokens]
+        server.count("chat_requests", "completion_tokens", len(words))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words)}
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model")}
+        time.sleep(server.ttft)
+        if not body.get("stream"):
+            time.sleep(server.token_interval * len(words))
+            self.send_json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload):
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(server.token_interval)
+            event(json.dumps({**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event(json.dumps({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOpenAI(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # embed_latency is paid per request and embed_item_latency per input; ttft before the first token
+    # and token_interval between tokens
+    def __init__(self, host="127.0.0.1", port=0, dim=1536, embed_latency=0.0, embed_item_latency=0.0, ttft=0.0,
+                 token_interval=0.0, completion_tokens=120):
+        super().__init__((host, port), _OpenAIHandler)
+        self.dim = dim
+        self.embed_latency = embed_latency
+        self.embed_item_latency = embed_item_latency
+        self.ttft = ttft
+        self.token_interval = token_interval
+        self.completion_tokens = completion_tokens
+        self.stats = {"embedding_requests": 0, "embedding_inputs": 0, "chat_requests": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, requests_key, amount_key, amount):
+        with self._lock:
+            self.stats[requests_key] += 1
+            self.stats[amount_key] += amount
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embeddings request")
+    parser.add_argument("--embed-item-latency", type=float, default=0.0, help="extra seconds per embedded input")
+    parser.add_argument("--ttft", type=float, default=0.0, help="seconds before the first chat token")
+    parser.add_argument("--token-interval", type=float, default=0.0, help="seconds between chat tokens")
+    parser.add_argument("--completion-tokens", type=int, default=120)
+    args = parser.parse_args()
+    server = FakeOpenAI(args.host, args.port, args.dim, args.embed_latency, args.embed_item_latency, args.ttft,
+                        args.token_interval, args.completion_tokens)
+    print(f"Fake OpenAI API on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,133 @@
+# Local stand-in for the Wayback Machine: the availability API, the CDX API and snapshot pages,
+# served from the HTML fixtures (benchmarks/fixtures.py) so the scrapers run without network access.
+# Every site has a few captures a year; each snapshot serves the fixture its site hashes to.
+#   python benchmarks/fake_wayback.py --port 8090 --latency 0.05
+# then run a scraper with
+#   WAYBACK_AVAILABLE_URL=http://127.0.0.1:8090/wayback/available WAYBACK_WEB_URL=http://127.0.0.1:8090
+
+import argparse
+import hashlib
+import http.server
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fixtures import describe_html_fixtures, html_fixtures
+
+CAPTURE_YEARS = ("2022", "2023", "2024", "2025")
+# Month-days captured each year
+CAPTURE_DAYS = ("0115", "0610", "1105")
+
+
+def _site_hash(site_url):
+    return int(hashlib.sha1(site_url.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def captures(site_url, from_year=None, to_year=None):
+    offset = _site_hash(site_url) % 24
+    timestamps = [f"{year}{day}{offset:02d}0000" for year in CAPTURE_YEARS for day in CAPTURE_DAYS
+                  if (not from_year or year >= from_year) and (not to_year or year <= to_year)]
+    return [[timestamp, site_url, "200", hashlib.sha1(timestamp.encode()).hexdigest()[:32]] for timestamp in timestamps]
+
+
+class _WaybackHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.count()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/wayback/available":
+            site = query.get("url", "")
+            latest = captures(site)[-1][0]
+            body = {"url": site, "archived_snapshots": {"closest": {
+                "available": True, "status": "200", "timestamp": latest, "url": self.server.snapshot_url(latest, site),
+            }}}
+            self.send(200, json.dumps(body).encode(), "application/json")
+        elif url.path == "/cdx/search/cdx":
+            rows = captures(query.get("url", ""), query.get("from"), query.get("to"))
+            header = ["timestamp", "original", "statuscode", "digest"]
+            fields = query.get("fl", ",".join(header)).split(",")
+            rows = [[row[header.index(field)] for field in fields] for row in rows]
+            self.send(200, json.dumps([fields] + rows if rows else []).encode(), "application/json")
+        elif url.path.startswith("/web/"):
+            _, _, rest = url.path.partition("/web/")
+            timestamp, _, site = rest.partition("/")
+            if not site or not timestamp.isdigit():
+                self.send(404, b"not found", "text/plain")
+                return
+            page = self.server.pages[_site_hash(site) % len(self.server.pages)]
+            self.server.count(len(page))
+            self.send(200, page, "text/html; charset=utf-8")
+        else:
+            self.send(404, b"not found", "text/plain")
+
+
+class FakeWayback(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fixtures=None):
+        super().__init__((host, port), _WaybackHandler)
+        self.latency = latency
+        self.fixtures = fixtures or html_fixtures()
+        self.pages = []
+        for path in self.fixtures:
+            with open(path, "rb") as f:
+                self.pages.append(f.read())
+        self.requests = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # Environment variables that point smr_pipeline.fetch and smr_pipeline.snapshots here
+    @property
+    def env(self):
+        return {"WAYBACK_AVAILABLE_URL": f"{self.url}/wayback/available", "WAYBACK_WEB_URL": self.url}
+
+    def snapshot_url(self, timestamp, site_url):
+        return f"{self.url}/web/{timestamp}/{site_url}"
+
+    def count(self, size=0):
+        with self._lock:
+            if size:
+                self.bytes_served += size
+            else:
+                self.requests += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    args = parser.parse_args()
+    server = FakeWayback(args.host, args.port, args.latency)
+    print(f"Fake Wayback serving {describe_html_fixtures(server.fixtures)} on {server.url}")
+    for key, value in server.env.items():
+        print(f"  {key}={value}")
+    server.serve_forever()
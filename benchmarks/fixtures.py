@@ -0,0 +1,108 @@
+# HTML fixtures for the offline benchmarks.
+# Pages are either recorded from the archive snapshots in a crawl state database and committed under
+# benchmarks/fixtures/html, so every machine measures the same pages, or, when none have been recorded,
+# synthesised from scraped_smr_sources.csv (with the nesting and boilerplate real pages have) into a
+# temporary directory. Benchmark reports name the set they ran on.
+
+import csv
+import html
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+csv.field_size_limit(sys.maxsize)
+
+HTML_FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures", "html")
+SYNTHETIC_FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "smr_synthetic_html_fixtures")
+CORPUS_CSV = os.path.join(ROOT, "scraped_smr_sources.csv")
+
+
+def _synthetic_page(title, paragraphs):
+    nav = "".join(f'<li><a href="/s{i}">Section {i}</a></li>' for i in range(12))
+    body = "".join(f"<div class=\"row\"><div class=\"col\"><p>{html.escape(p)}</p></div></div>" for p in paragraphs)
+    return (
+        f"<!DOCTYPE html><html><head><title>{html.escape(title)}</title>"
+        "<script>window.dataLayer=[];function track(){}</script><style>.row{margin:0}</style></head>"
+        f"<body><header><nav><ul>{nav}</ul></nav></header>"
+        f"<div id=\"page\"><div class=\"container\"><h1>{html.escape(title)}</h1>"
+        f"<article><div class=\"content\">{body}</div></article></div></div>"
+        "<footer><div><p>Subscribe to our newsletter</p><p>Privacy Policy | Terms of Use</p></div></footer>"
+        "</body></html>"
+    )
+
+
+def synthesise_html_fixtures(out_dir=SYNTHETIC_FIXTURE_DIR, corpus_csv=CORPUS_CSV):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    with open(corpus_csv, newline="", encoding="utf-8") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            lines = [line.strip() for line in row["content"].splitlines() if line.strip()]
+            path = os.path.join(out_dir, f"synthetic_{i:03d}.html")
+            with open(path, "w", encoding="utf-8") as out:
+                out.write(_synthetic_page(lines[0] if lines else row["original_url"], lines))
+            paths.append(path)
+    return paths
+
+
+# Save the raw HTML of every snapshot recorded in a crawl state database
+def record_html_fixtures(state_path, out_dir=HTML_FIXTURE_DIR):
+    import sqlite3
+    from smr_pipeline.fetch import Fetcher
+
+    os.makedirs(out_dir, exist_ok=True)
+    fetcher = Fetcher()
+    conn = sqlite3.connect(state_path)
+    rows = conn.execute("SELECT original_url, archive_url FROM sources WHERE http_status = 200").fetchall()
+    paths = []
+    for i, (original_url, archive_url) in enumerate(rows):
+        response = fetcher.get(archive_url)
+        if response.status_code != 200:
+            continue
+        path = os.path.join(out_dir, f"recorded_{i:03d}.html")
+        with open(path, "wb") as out:
+            out.write(response.content)
+        paths.append(path)
+    return paths
+
+
+def _html_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".html"))
+
+
+# The recorded pages, or synthetic ones rebuilt from the corpus when none have been recorded
+def html_fixtures(recorded_dir=HTML_FIXTURE_DIR):
+    return _html_files(recorded_dir) or synthesise_html_fixtures()
+
+
+# e.g. "9 recorded pages", for benchmark output and reports
+def describe_html_fixtures(paths):
+    kinds = {"synthetic" if os.path.basename(path).startswith("synthetic_") else "recorded" for path in paths}
+    return f"{len(paths)} {'/'.join(sorted(kinds))} pages"
+
+
+# A corpus CSV of n_docs sources for indexing at scale: each document mixes sentences drawn from the
+# real corpus, so documents stay distinct enough for deduplication to keep them
+def synthesise_corpus(out_path, n_docs, corpus_csv=CORPUS_CSV, seed=1):
+    import random
+    from smr_pipeline.chunking import split_sentences
+
+    with open(corpus_csv, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    sentences = [s for row in rows for s in split_sentences(row["content"]) if len(s.split()) >= 4]
+    per_doc = max(10, len(sentences) // max(len(rows), 1))
+    rng = random.Random(seed)
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["original_url", "archive_url", "content"])
+        writer.writeheader()
+        for i in range(n_docs):
+            site = f"https://source{i:05d}.example.org"
+            writer.writerow({
+                "original_url": site,
+                "archive_url": f"http://web.archive.org/web/20250101000000/{site}",
+                "content": " ".join(rng.sample(sentences, min(per_doc, len(sentences)))),
+            })
+    return out_path
@@ -0,0 +1,129 @@
+# Local SMTP debugging server: accepts mail without TLS or auth, keeps what it receives,
+# and can add latency to the greeting (standing in for TLS + login) and to each command.
+# For tests it can refuse given recipients and drop its open connections mid-session.
+#   python benchmarks/smtp_sink.py --port 1025 --handshake-latency 0.3
+# then run the app with SMTP_SERVER = "localhost", SMTP_PORT = 1025, SMTP_STARTTLS = false, SMTP_LOGIN = false.
+
+import argparse
+import email
+import socket
+import socketserver
+import threading
+import time
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        if self.server.command_latency:
+            time.sleep(self.server.command_latency)
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        with self.server._lock:
+            self.server._open.add(self.connection)
+        try:
+            self._session()
+        finally:
+            with self.server._lock:
+                self.server._open.discard(self.connection)
+
+    def _session(self):
+        time.sleep(self.server.handshake_latency)
+        self.reply("220 smtp-sink ready")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-smtp-sink\r\n")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 smtp-sink")
+            elif verb == "MAIL":
+                sender, recipients = command[10:].strip("<> "), []
+                self.server.transactions += 1
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command[8:].strip("<> ")
+                if recipient in self.server.refuse:
+                    self.reply("550 5.1.1 Mailbox unavailable")
+                    continue
+                recipients.append(recipient)
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b".\n", b""):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                self.server.record(sender, recipients, b"".join(lines))
+                self.reply("250 OK: queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # refuse: recipient addresses answered with 550; transactions counts MAIL commands, delivered or not
+    def __init__(self, host="127.0.0.1", port=0, handshake_latency=0.0, command_latency=0.0, verbose=False,
+                 refuse=()):
+        super().__init__((host, port), _SmtpHandler)
+        self.handshake_latency = handshake_latency
+        self.command_latency = command_latency
+        self.verbose = verbose
+        self.refuse = set(refuse)
+        self.messages = []
+        self.connections = 0
+        self.transactions = 0
+        self._open = set()
+        self._lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def record(self, sender, recipients, data):
+        message = email.message_from_bytes(data)
+        with self._lock:
+            self.messages.append({"from": sender, "to": recipients, "subject": message["Subject"], "size": len(data)})
+        if self.verbose:
+            print(f"{sender} -> {', '.join(recipients)}: {message['Subject']} ({len(data)} bytes)")
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    # Cut every open client connection, as a server restart or an idle timeout would
+    def drop_connections(self):
+        with self._lock:
+            connections = list(self._open)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--handshake-latency", type=float, default=0.0, help="seconds before the greeting")
+    parser.add_argument("--command-latency", type=float, default=0.0, help="seconds before each reply")
+    args = parser.parse_args()
+    sink = SmtpSink(args.host, args.port, args.handshake_latency, args.command_latency, verbose=True)
+    print(f"SMTP sink listening on {args.host}:{sink.port}")
+    sink.serve_forever()
@@ -0,0 +1,65 @@
+import glob
+import hmac
+import os
+
+import streamlit as st
+from smr_pipeline import telemetry
+
+# Pipeline latency per stage, from this server's spans or from a recorded JSONL run (e.g. a scraper's).
+# Only shown once ADMIN_PASSWORD is set in the secrets and entered. Recorded runs are read from
+# TELEMETRY_PATH or from the *.jsonl files in the TELEMETRY_DIR secret, never from an arbitrary path.
+st.title("Pipeline telemetry")
+
+ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD")
+if not ADMIN_PASSWORD:
+    st.info("Set ADMIN_PASSWORD in the secrets to enable this page.")
+    st.stop()
+password = st.text_input("Admin password", type="password")
+if not hmac.compare_digest(password.encode("utf-8"), ADMIN_PASSWORD.encode("utf-8")):
+    st.stop()
+
+TELEMETRY_DIR = st.secrets.get("TELEMETRY_DIR")
+recordings = [telemetry.DEFAULT_PATH] if telemetry.DEFAULT_PATH and os.path.isfile(telemetry.DEFAULT_PATH) else []
+if TELEMETRY_DIR:
+    recordings += sorted(set(glob.glob(os.path.join(TELEMETRY_DIR, "*.jsonl"))) - set(recordings))
+
+source = st.radio("Spans from", ["This app", "JSONL file"] if recordings else ["This app"], horizontal=True)
+if source == "This app":
+    tracer = telemetry.tracer
+    if tracer.path:
+        st.caption(f"Also recording to {tracer.path}")
+else:
+    path = st.selectbox("Telemetry file", recordings)
+    try:
+        tracer = telemetry.Tracer.from_jsonl(path)
+    except (OSError, ValueError, KeyError) as e:
+        st.error(f"Couldn't read {path}: {e}")
+        st.stop()
+
+summary = tracer.summary()
+if not summary:
+    st.info("No spans recorded yet. Run an analysis (or a scraper with TELEMETRY_PATH set) and refresh.")
+    st.stop()
+
+st.subheader("Latency per stage")
+st.dataframe(
+    [{"stage": name, "count": stage["count"], "errors": stage["errors"], "p50 ms": stage["p50_ms"],
+      "p95 ms": stage["p95_ms"], "mean ms": stage["mean_ms"]} for name, stage in summary.items()],
+    hide_index=True,
+)
+
+st.subheader("Totals")
+st.caption("Quantities counted across spans, e.g. bytes downloaded or tokens used")
+st.dataframe(
+    [{"stage": name, "count": key, "total": value}
+     for name, stage in summary.items() for key, value in stage["totals"].items()],
+    hide_index=True,
+)
+
+metrics = tracer.prometheus()
+col1, col2 = st.columns(2)
+col1.download_button("Download Prometheus metrics", metrics, file_name="smr_metrics.prom", mime="text/plain")
+if col2.button("Refresh"):
+    st.rerun()
+with st.expander("Prometheus text"):
+    st.code(metrics, language="text")
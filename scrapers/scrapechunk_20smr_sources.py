@@ -1,14 +1,20 @@
 # Archive.org Scraper + Chunking + Embedding + Streamlit RAG Demo for SMR Hackathon
 
-import requests
-import pandas as pd
-import time
+import csv
 import os
-from bs4 import BeautifulSoup
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smr_pipeline.embedding_backends import SentenceTransformerBackend
+from smr_pipeline.embedding_pipeline import embed_texts
+from smr_pipeline.chunk_store import ChunkStore
+from smr_pipeline.chunking import Chunker
+from smr_pipeline.dedup import dedupe_chunks, drop_repeated_lines_mapped
+from smr_pipeline.crawl_state import CrawlState
+from smr_pipeline.extract import extract_text
+from smr_pipeline.fetch import CsvResultWriter, Fetcher, run_concurrently
 
 # List of URLs to retrieve from Archive.org
 urls = [
@@ -34,114 +40,129 @@ urls = [
     "https://www.nucnet.org"
 ]
 
+# Shared session; archive.org requests are rate-limited separately from other hosts
+fetcher = Fetcher()
+MAX_WORKERS = 8
+CORPUS_CSV = "scraped_smr_sources.csv"
+CHUNK_STORE_PATH = "scrapechunk_corpus.db"
+INDEX_KIND = "flat"  # or ivf, hnsw, ivfpq once the corpus outgrows exact search
+# The model loads on first use, not at import
+model = SentenceTransformerBackend('all-MiniLM-L6-v2')
+
+# Reruns skip sources checked within the last 12 hours and re-fetch only changed snapshots (opened by scrape())
+state = None
+
 # Function to get the latest snapshot URL from archive.org
 def get_latest_archive_url(site_url):
-    api_url = f"http://archive.org/wayback/available?url={site_url}"
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        data = response.json()
-        try:
-            return data['archived_snapshots']['closest']['url']
-        except KeyError:
-            return None
-    return None
+    return fetcher.latest_archive_url(site_url)
 
 # Function to scrape text from a webpage
 def scrape_text_from_url(archive_url):
     try:
-        response = requests.get(archive_url, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        paragraphs = soup.find_all('p')
-        text = "\n".join([p.get_text() for p in paragraphs if p.get_text()])
-        return text[:5000]  # Limit to 5000 characters for now
+        response = fetcher.get(archive_url, stream=True)
+        if response.status_code != 200:
+            response.close()
+            return "", response.status_code
+        # Streams the page and stops downloading once 5000 characters of <p> text are collected
+        text = extract_text(response, tags=('p',), max_chars=5000)
+        return text, response.status_code
     except Exception as e:
         print(f"Error scraping {archive_url}: {e}")
-        return ""
-
-# Function to split text into smaller chunks
-def chunk_text(text, max_chunk_size=500):
-    sentences = text.split(".")
-    chunks = []
-    current_chunk = ""
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) < max_chunk_size:
-            current_chunk += sentence + "."
-        else:
-            chunks.append(current_chunk)
-            current_chunk = sentence + "."
-    if current_chunk:
-        chunks.append(current_chunk)
-    return chunks
+        return "", None
 
 # Main scraping loop
-scraped_data = []
-
-if not os.path.exists("scrapedchunked_smr_sources.csv"):
-    for url in urls:
-        print(f"Processing: {url}")
-        archive_url = get_latest_archive_url(url)
-        if archive_url:
-            print(f" -> Archive found: {archive_url}")
-            text = scrape_text_from_url(archive_url)
-            scraped_data.append({
-                'original_url': url,
-                'archive_url': archive_url,
-                'content': text
-            })
-        else:
-            print(f" -> No archive found.")
-        time.sleep(1)  # Be nice to archive.org
-
-    scraped_df = pd.DataFrame(scraped_data)
-    scraped_df.to_csv("scraped_smr_sources.csv", index=False)
-    print("Scraping complete! Saved to scraped_smr_sources.csv")
-else:
-    scraped_df = pd.read_csv("scraped_smr_sources.csv")
-
-# Chunk and embed
-print("Chunking and embedding...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-all_texts = []
-all_chunks = []
-original_urls = []
-
-for idx, row in scraped_df.iterrows():
-    chunks = chunk_text(row['content'])
-    all_chunks.extend(chunks)
-    original_urls.extend([row['original_url']] * len(chunks))
-
-embeddings = model.encode(all_chunks, convert_to_numpy=True)
-
-# Save to FAISS
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
-faiss.write_index(index, "smr_index.faiss")
-
-# Save chunks metadata
-chunks_df = pd.DataFrame({
-    'chunk': all_chunks,
-    'source': original_urls
-})
-chunks_df.to_csv("chunks_metadata.csv", index=False)
-
-print("Chunking and embedding complete!")
-
-# Simple Streamlit RAG App
-def load_index_and_chunks():
-    index = faiss.read_index("smr_index.faiss")
-    chunks_df = pd.read_csv("chunks_metadata.csv")
-    return index, chunks_df
-
-def search_index(query, index, chunks_df, model, top_k=5):
-    query_vec = model.encode([query]).astype('float32')
+def process(url):
+    print(f"Processing: {url}")
+    entry = state.crawl(url, get_latest_archive_url, scrape_text_from_url)
+    if entry is None:
+        print(f" -> No archive found for {url}")
+    elif entry['http_status'] == 200:
+        return {
+            'original_url': url,
+            'archive_url': entry['archive_url'],
+            'content': entry['content']
+        }
+    return None
+
+def scrape():
+    global state
+    state = CrawlState("crawl_state.db", max_age_hours=12)
+    with CsvResultWriter(CORPUS_CSV, ['original_url', 'archive_url', 'content']) as writer:
+        scraped_data = run_concurrently(urls, process, max_workers=MAX_WORKERS, on_result=lambda url, row: row and writer.write(row))
+    print(f"Scraping complete! Saved to {CORPUS_CSV}")
+    return [row for row in scraped_data if row]
+
+# Chunk into the shared chunk store, embed every chunk and save the index next to the store
+def build_corpus(rows):
+    from smr_pipeline.vector_index import build_index, index_path, save_index
+
+    print("Chunking and embedding...")
+    store = ChunkStore(CHUNK_STORE_PATH)
+    chunker = Chunker()
+    # Chunk each page without its repeated lines, keeping a map back to offsets in the original content
+    mapped = [drop_repeated_lines_mapped(row['content']) for row in rows]
+    flat = list(chunker.chunk_documents((i, content) for i, (content, _) in enumerate(mapped)))
+
+    # Drop duplicate and near-duplicate chunks so they are never embedded
+    keep, dedup_report = dedupe_chunks([chunk for _, _, chunk in flat])
+    print(f"Dedup: {dedup_report.as_dict(64)}")
+    chunks_by_row = [[] for _ in rows]
+    for j in keep:
+        i, offset, chunk = flat[j]
+        chunks_by_row[i].append((mapped[i][1](offset), chunk))
+    for row, chunks in zip(rows, chunks_by_row):
+        store.replace_source(row['original_url'], row['archive_url'], chunks)
+
+    # Embed every chunk in the store
+    ids = np.array(store.column("id"), dtype="int64")
+    all_chunks = store.column("text")
+    embeddings, mask, stats = embed_texts(all_chunks, model, batch_size=64, max_in_flight=model.max_in_flight)
+    print(f"Embedding: {stats}")
+    embeddings = embeddings[mask]
+
+    # Record each chunk's index row in the store
+    index = build_index(embeddings, kind=INDEX_KIND)
+    save_index(index, index_path(CHUNK_STORE_PATH, INDEX_KIND),
+               {"kind": INDEX_KIND, "embedding_backend": model.name, "embedding_model": model.identity,
+                "dim": int(embeddings.shape[1]), "count": len(embeddings)})
+    store.set_embedding_rows(ids[mask])
+    print("Chunking and embedding complete!")
+
+# Simple Streamlit RAG App; builds the index from the last scrape if there isn't one yet
+@st.cache_resource
+def load_index_and_store():
+    from smr_pipeline.vector_index import index_path, load_index
+
+    path = index_path(CHUNK_STORE_PATH, INDEX_KIND)
+    if not os.path.exists(path):
+        csv.field_size_limit(sys.maxsize)
+        with open(CORPUS_CSV, newline="", encoding="utf-8") as f:
+            build_corpus(list(csv.DictReader(f)))
+    return load_index(path, {"embedding_model": model.identity}), ChunkStore(CHUNK_STORE_PATH)
+
+def search_index(query, index, store, model, top_k=5):
+    query_vec, _ = model([query])
     D, I = index.search(query_vec, top_k)
-    results = chunks_df.iloc[I[0]]
-    return results
+    return store.rows_for_embedding_rows(I[0])
+
+def run_demo():
+    st.title("SMR Risk Report Generator (Hackathon Demo)")
+
+    query = st.text_input("Enter your question (e.g., What are real estate risks with SMRs?)")
 
-st.title("SMR Risk Report Generator (Hackathon Demo)")
+    if query:
+        with st.spinner("Searching knowledge base..."):
+            index, store = load_index_and_store()
+            results = search_index(query, index, store, model)
 
-query = st.text_input("Enter your question (e.g., What are real estate risks with SMRs?)")
+        st.subheader("Relevant Findings:")
+        for result in results:
+            st.write(result['text'])
+            st.caption(f"Source: {result['source_url']}")
 
-if query:
-    with st.spinner("Searching knowledge base..."):
+# python scrapechunk_20smr_sources.py scrapes and indexes; streamlit run serves the demo
+if __name__ == "__main__":
+    if st.runtime.exists():
+        run_demo()
+    else:
+        build_corpus(scrape())
@@ -1,9 +1,12 @@
 # archive_scraper.py
 
-import requests
-import pandas as pd
-import time
-from bs4 import BeautifulSoup
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smr_pipeline.crawl_state import CrawlState
+from smr_pipeline.extract import extract_text
+from smr_pipeline.fetch import CsvResultWriter, Fetcher, run_concurrently
 
 # List of URLs you want to scrape (the real top 20 you selected)
 urls = [
@@ -29,50 +32,53 @@ urls = [
     "https://www.nucnet.org"
 ]
 
+# Shared session; archive.org requests are rate-limited separately from other hosts
+fetcher = Fetcher()
+MAX_WORKERS = 8
+
+# Reruns skip sources checked within the last 12 hours and re-fetch only changed snapshots (opened by main())
+state = None
+
 # Function to get latest archived snapshot
 def get_latest_archive_url(site_url):
-    api_url = f"http://archive.org/wayback/available?url={site_url}"
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        data = response.json()
-        try:
-            return data['archived_snapshots']['closest']['url']
-        except KeyError:
-            return None
-    return None
+    return fetcher.latest_archive_url(site_url)
 
 # Function to scrape text from an archive URL
 def scrape_text_from_url(archive_url):
     try:
-        response = requests.get(archive_url, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        paragraphs = soup.find_all('p')
-        text = "\n".join([p.get_text() for p in paragraphs if p.get_text()])
-        return text[:5000]  # Limit to 5000 characters per site
+        response = fetcher.get(archive_url, stream=True)
+        if response.status_code != 200:
+            response.close()
+            return "", response.status_code
+        # Streams the page and stops downloading once 5000 characters of <p> text are collected
+        text = extract_text(response, tags=('p',), max_chars=5000)
+        return text, response.status_code
     except Exception as e:
         print(f"Error scraping {archive_url}: {e}")
-        return ""
+        return "", None
 
 # Main scraping
-scraped_data = []
-
-for url in urls:
+def process(url):
     print(f"Processing: {url}")
-    archive_url = get_latest_archive_url(url)
-    if archive_url:
-        print(f" -> Archive found: {archive_url}")
-        text = scrape_text_from_url(archive_url)
-        scraped_data.append({
+    entry = state.crawl(url, get_latest_archive_url, scrape_text_from_url)
+    if entry is None:
+        print(f" -> No archive found for {url}")
+    elif entry['http_status'] == 200:
+        return {
             'original_url': url,
-            'archive_url': archive_url,
-            'content': text
-        })
-    else:
-        print(f" -> No archive found.")
-    time.sleep(1)  # Be nice to Archive.org!
+            'archive_url': entry['archive_url'],
+            'content': entry['content']
+        }
+    return None
+
+# Save to CSV as each site completes
+def main():
+    global state
+    state = CrawlState("crawl_state.db", max_age_hours=12)
+    with CsvResultWriter("scraped_smr_sources.csv", ['original_url', 'archive_url', 'content']) as writer:
+        run_concurrently(urls, process, max_workers=MAX_WORKERS, on_result=lambda url, row: row and writer.write(row))
 
-# Save to CSV
-scraped_df = pd.DataFrame(scraped_data)
-scraped_df.to_csv("scraped_smr_sources.csv", index=False)
+    print("✅ Scraping complete! File saved: scraped_smr_sources.csv")
 
-print("✅ Scraping complete! File saved: scraped222_smr_sources.csv")
+if __name__ == "__main__":
+    main()
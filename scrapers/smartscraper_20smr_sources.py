@@ -1,9 +1,13 @@
 # smart_archive_scraper.py
 
-import requests
-import pandas as pd
-import time
-from bs4 import BeautifulSoup
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smr_pipeline.crawl_state import CrawlState
+from smr_pipeline.extract import extract_text
+from smr_pipeline.fetch import CsvResultWriter, Fetcher, run_concurrently
+from smr_pipeline.snapshots import SnapshotResolver
 
 # Your Top 20 SMR-related URLs
 urls = [
@@ -32,74 +36,64 @@ urls = [
 # YEARS to prioritize
 TARGET_YEARS = ["2025", "2024", "2023", "2022"]
 
-# Function to get the closest snapshot in target years
-def get_archive_url(site_url, years=TARGET_YEARS):
-    for year in years:
-        timestamp = year + "0101"  # January 1st of the year
-        api_url = f"http://archive.org/wayback/available?url={site_url}&timestamp={timestamp}"
-        response = requests.get(api_url)
-        if response.status_code == 200:
-            data = response.json()
-            try:
-                return data['archived_snapshots']['closest']['url']
-            except KeyError:
-                continue  # Try next year if no archive found
-    return None
+# Shared session; archive.org requests are rate-limited separately from other hosts
+fetcher = Fetcher()
+MAX_WORKERS = 8
+
+# Reruns skip sources checked within the last 12 hours and re-fetch only changed snapshots;
+# one CDX request per site lists every capture across TARGET_YEARS and the newest one is scraped (both opened by main())
+state = None
+resolver = None
+
+# Function to get the newest snapshot in target years
+def get_archive_url(site_url):
+    return resolver.resolve_one(site_url)
 
 # Function to scrape full article text smartly
 def scrape_text_from_url(archive_url):
     try:
-        response = requests.get(archive_url, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Try grabbing <article> tag first
-        article = soup.find('article')
-        if article:
-            text = article.get_text(separator="\n")
-        else:
-            # Fallback: all <p> and <div> tags
-            paragraphs = soup.find_all(['p', 'div'])
-            text = "\n".join([p.get_text() for p in paragraphs if p.get_text()])
+        response = fetcher.get(archive_url, stream=True)
+        if response.status_code != 200:
+            response.close()
+            return "", response.status_code
 
-        text = text.strip()
-
-        # Also check the headline if needed
-        headline = soup.find('h1')
-        headline_text = headline.get_text() if headline else ""
-
-        combined_text = headline_text + "\n" + text
+        # Headline, article body and nested <div>s each contribute their own text once;
+        # the download stops as soon as 10,000 characters are collected
+        combined_text = extract_text(response, max_chars=10000)
 
         # Only keep if "nuclear" appears at least twice
         if combined_text.lower().count("nuclear") >= 2:
-            return combined_text[:10000]  # Limit size for efficiency
+            return combined_text, response.status_code
         else:
             print(f"Filtered out (nuclear too rare): {archive_url}")
-            return ""
+            return "", response.status_code
     except Exception as e:
         print(f"Error scraping {archive_url}: {e}")
-        return ""
+        return "", None
 
 # Main loop
-scraped_data = []
-
-for url in urls:
+def process(url):
     print(f"Processing: {url}")
-    archive_url = get_archive_url(url)
-    if archive_url:
-        print(f" -> Found archive: {archive_url}")
-        text = scrape_text_from_url(archive_url)
-        if text:
-            scraped_data.append({
-                'original_url': url,
-                'archive_url': archive_url,
-                'content': text
-            })
-    else:
+    entry = state.crawl(url, get_archive_url, scrape_text_from_url)
+    if entry is None:
         print(f" -> No archive found for {url}")
-    time.sleep(1)  # Be nice to Archive.org
+    elif entry['content']:
+        return {
+            'original_url': url,
+            'archive_url': entry['archive_url'],
+            'content': entry['content']
+        }
+    return None
+
+# Save results as each site completes
+def main():
+    global state, resolver
+    state = CrawlState("smartscrape_state.db", max_age_hours=12)
+    resolver = SnapshotResolver(fetcher, min(TARGET_YEARS), max(TARGET_YEARS), policy="newest", state=state)
+    with CsvResultWriter("smartscrape_smr_sources.csv", ['original_url', 'archive_url', 'content']) as writer:
+        run_concurrently(urls, process, max_workers=MAX_WORKERS, on_result=lambda url, row: row and writer.write(row))
 
-# Save results
-scraped_df = pd.DataFrame(scraped_data)
-scraped_df.to_csv("smartscrape_smr_sources.csv", index=False)
+    print("✅ Scraping complete! Saved to smartscrape_smr_sources.csv")
 
-print("✅ Scraping complete! Saved to scraped_smr_sources.csv")
+if __name__ == "__main__":
+    main()
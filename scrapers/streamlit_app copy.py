@@ -1,72 +1,68 @@
 
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-import faiss
 import streamlit as st
 import numpy as np
+import os
+import sys
 
-# Load scraped data
-scraped_df = pd.read_csv("scraped_smr_sources.csv")
-
-# Load embedding model
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
-# Chunk text into smaller pieces
-def chunk_text(text, max_tokens=500):
-    sentences = text.split(". ")
-    chunks = []
-    current_chunk = ""
-    for sentence in sentences:
-        if len(current_chunk.split()) + len(sentence.split()) <= max_tokens:
-            current_chunk += sentence + ". "
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence + ". "
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    return chunks
-
-# Prepare all chunks
-documents = []
-metadata = []
-
-for idx, row in scraped_df.iterrows():
-    chunks = chunk_text(row['content'])
-    for chunk in chunks:
-        documents.append(chunk)
-        metadata.append({
-            'original_url': row['original_url'],
-            'archive_url': row['archive_url']
-        })
-
-# Embed all chunks
-embeddings = model.encode(documents)
-
-# Build FAISS index
-dim = embeddings.shape[1]
-index = faiss.IndexFlatL2(dim)
-index.add(np.array(embeddings))
-
-# Save for future use
-faiss.write_index(index, "faiss_index.idx")
-pd.DataFrame(metadata).to_csv("metadata.csv", index=False)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smr_pipeline.chunk_store import ChunkStore
+from smr_pipeline.chunking import Chunker
+
+INDEX_KIND = "flat"
+
+# Built on the first question rather than at import, so the page renders before pandas, the model and FAISS load
+@st.cache_resource
+def load_search():
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
+    from smr_pipeline.vector_index import build_index, index_path, load_index, save_index
+
+    # Load scraped data
+    scraped_df = pd.read_csv("scraped_smr_sources.csv")
+
+    # Load embedding model
+    model = SentenceTransformer('all-MiniLM-L6-v2')
+
+    # Prepare all chunks in the shared chunk store
+    store = ChunkStore("app_copy_corpus.db")
+
+    chunker = Chunker()
+    for idx, row in scraped_df.iterrows():
+        store.replace_source(row['original_url'], row['archive_url'], list(chunker(row['content'])))
+
+    ids = np.array(store.column("id"), dtype="int64")
+    documents = store.column("text")
+
+    # Embed all chunks
+    embeddings = model.encode(documents)
+
+    # Build FAISS index (flat, ivf, hnsw or ivfpq)
+    index = build_index(np.array(embeddings), kind=INDEX_KIND)
+
+    # Save for future use next to the chunk store; each chunk records its index row
+    index_file = index_path("app_copy_corpus.db", INDEX_KIND)
+    save_index(index, index_file, {"kind": INDEX_KIND, "embedding_backend": "local", "embedding_model": "local:all-MiniLM-L6-v2",
+                                   "dim": int(np.shape(embeddings)[1]), "count": len(embeddings)})
+    store.set_embedding_rows(ids)
+    return model, load_index(index_file, {}), store
 
 # Streamlit App
 st.title("SMR Risk Report Generator 🚀")
-metadata_df = pd.read_csv("metadata.csv")
-index = faiss.read_index("faiss_index.idx")
 
 query = st.text_input("Enter your question about SMRs:")
 
 if query:
+    with st.spinner("Loading knowledge base..."):
+        model, index, store = load_search()
     query_embedding = model.encode([query])
-    D, I = index.search(np.array(query_embedding), k=5)
+    D, I = index.search(np.array(query_embedding, dtype="float32"), k=5)
+    results = store.rows_for_embedding_rows(I[0])
 
     st.subheader("Relevant Findings:")
-    for idx in I[0]:
-        st.write(documents[idx])
-        st.caption(f"Source: {metadata_df.iloc[idx]['original_url']}")
+    for result in results:
+        st.write(result['text'])
+        st.caption(f"Source: {result['source_url']}")
 
     st.subheader("Auto-Generated Summary:")
-    full_context = "\n".join([documents[idx] for idx in I[0]])
+    full_context = "\n".join([result['text'] for result in results])
     st.write("(Summarizer Placeholder)\n" + full_context[:2000] + "...")
@@ -0,0 +1 @@
+# Shared building blocks for the SMR scrapers and the Streamlit agent app
@@ -0,0 +1,65 @@
+# Tiny dependency-graph executor for the agent pipeline.
+# Each stage starts as soon as the stages it depends on have finished, so independent
+# agents and their retrieval calls overlap and total latency tracks the critical path.
+
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from smr_pipeline import telemetry
+
+
+class Stage:
+    # fn is called with one keyword argument per dependency, holding that stage's result
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+def _check(stages):
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names in {names}")
+    known = set()
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in known]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} depends on {missing}, which must be listed before it")
+        known.add(stage.name)
+
+
+async def _run(stages, pool):
+    loop = asyncio.get_running_loop()
+    origin = time.perf_counter()
+    results = {}
+    timings = {}
+    tasks = {}
+
+    async def run_stage(stage):
+        await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+        start = time.perf_counter()
+        kwargs = {dep: results[dep] for dep in stage.deps}
+
+        def call():
+            with telemetry.span(f"agent.{stage.name}"):
+                return stage.fn(**kwargs)
+
+        # Run in a copy of this task's context so the stage's spans nest under the caller's span
+        results[stage.name] = await loop.run_in_executor(pool, contextvars.copy_context().run, call)
+        timings[stage.name] = {"start": start - origin, "seconds": time.perf_counter() - start}
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+    await asyncio.gather(*tasks.values())
+    timings["total"] = {"start": 0.0, "seconds": time.perf_counter() - origin}
+    return results, timings
+
+
+# Run the stages (listed in dependency order) on a thread pool.
+# Returns (results by stage name, {"stage": {"start": s, "seconds": s}, ..., "total": ...}).
+def run_graph(stages, max_workers=None, thread_initializer=None):
+    _check(stages)
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages), initializer=thread_initializer) as pool:
+        return asyncio.run(_run(stages, pool))
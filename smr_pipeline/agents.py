@@ -0,0 +1,101 @@
+# Prompts and dependency graph for the three-agent project analysis.
+# Agents 1 and 2 are independent; only Agent 3 needs Agent 2's risk list.
+
+from smr_pipeline.agent_graph import Stage
+
+AGENT_MODEL = "gpt-4"
+SYSTEM_PROMPTS = {
+    "agent_1": "You are a strategic advisor.",
+    "agent_2": "You are a nuclear risk analyst.",
+    "agent_3": "You are a risk mitigation strategist.",
+}
+
+
+def format_context(chunks):
+    return "".join("- " + chunk + "\n" for chunk in chunks)
+
+
+def agent1_query(project):
+    return f"{project['project_name']} {project['location']} {', '.join(project['power_type'])}"
+
+
+def agent2_query(project):
+    return f"{project['project_name']} {', '.join(project['strategic_objectives'])}"
+
+
+def agent1_prompt(project, chunks):
+    return f"""
+You are Agent 1, a strategic infrastructure advisor.
+Context from recent nuclear-related sources:
+{format_context(chunks)}
+
+Evaluate the following:
+Project: {project['project_name']} in {project['location']}
+Power Type: {', '.join(project['power_type'])}
+Infrastructure Type: {', '.join(project['infra_type'])}
+Objectives: {', '.join(project['strategic_objectives'])}
+Known Risks: {', '.join(project['anticipated_risks'])}
+Constraints: {', '.join(project['timeline_constraints'])}
+Partners: {project['known_partners']}
+
+Respond with:
+1) Summary of risks,
+2) Strategic Recommendation,
+3) One-sentence rationale,
+4) Rationale details.
+"""
+
+
+def agent2_prompt(project, chunks):
+    return f"""
+You are Agent 2, a nuclear infrastructure risk translator.
+Context from recent nuclear-related sources:
+{format_context(chunks)}
+
+Identify 3–5 core risks in:
+Project: {project['project_name']}, Objectives: {', '.join(project['strategic_objectives'])}
+
+Output format:
+- Risk Type
+- Description
+- Urgency Level (Low, Medium, High)
+"""
+
+
+def agent3_prompt(chunks, agent2_output):
+    return f"""
+You are Agent 3, a mitigation planner for nuclear infrastructure projects.
+Context from nuclear-specific sources:
+{format_context(chunks)}
+
+Based on these risks:
+{agent2_output}
+
+Generate:
+- Mitigation Strategy per risk
+- Clear and actionable execution steps
+"""
+
+
+def unpacked_context(agent, hits):
+    return [hit["text"] for hit in hits]
+
+
+# retrieve_many(queries) -> one list of retrieval hits per query; complete(agent, system_prompt, prompt) -> text;
+# pack(agent, hits) -> the chunk texts that go in that agent's prompt (see ContextBudgeter.pack).
+# Agents 1 and 2 share one batched retrieval and are packed together, Agent 1 first.
+def agent_stages(project, retrieve_many, complete, pack=unpacked_context):
+    def retrieve_1_2():
+        hits_1, hits_2 = retrieve_many([agent1_query(project), agent2_query(project)])
+        return pack("agent_1", hits_1), pack("agent_2", hits_2)
+
+    return [
+        Stage("retrieve_1_2", retrieve_1_2),
+        Stage("agent_1", lambda retrieve_1_2: complete("agent_1", SYSTEM_PROMPTS["agent_1"], agent1_prompt(project, retrieve_1_2[0])),
+              deps=["retrieve_1_2"]),
+        Stage("agent_2", lambda retrieve_1_2: complete("agent_2", SYSTEM_PROMPTS["agent_2"], agent2_prompt(project, retrieve_1_2[1])),
+              deps=["retrieve_1_2"]),
+        Stage("retrieve_3", lambda agent_2: pack("agent_3", retrieve_many([agent_2])[0]), deps=["agent_2"]),
+        Stage("agent_3", lambda retrieve_3, agent_2: complete("agent_3", SYSTEM_PROMPTS["agent_3"], agent3_prompt(retrieve_3, agent_2)),
+              deps=["retrieve_3", "agent_2"]),
+    ]
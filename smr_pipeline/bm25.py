@@ -0,0 +1,111 @@
+# In-process BM25 inverted index over chunks, plus reciprocal rank fusion for hybrid retrieval.
+# Document ids are vector index rows, so lexical and dense results share one id space.
+
+import math
+import os
+import pickle
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+# BM25 artifact kept next to the vector index: smr_corpus.flat.faiss -> smr_corpus.flat.bm25
+def bm25_path(index_path):
+    return os.path.splitext(index_path)[0] + ".bm25"
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids = np.zeros(0, dtype="int64")
+        self.doc_lengths = np.zeros(0, dtype="float32")
+        self.postings = {}
+        self.meta = {}
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, doc_ids, texts, k1=1.5, b=0.75):
+        index = cls(k1, b)
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                positions, frequencies = postings[term]
+                positions.append(position)
+                frequencies.append(count)
+        index.doc_ids = np.asarray(doc_ids, dtype="int64")
+        index.doc_lengths = np.asarray(lengths, dtype="float32")
+        index.postings = {
+            term: (np.asarray(positions, dtype="int32"), np.asarray(frequencies, dtype="float32"))
+            for term, (positions, frequencies) in postings.items()
+        }
+        return index
+
+    # Scores for every document, accumulated term by term from the postings lists
+    def _scores(self, query):
+        scores = np.zeros(len(self.doc_ids), dtype="float32")
+        if not len(self.doc_ids):
+            return scores
+        average_length = float(self.doc_lengths.mean()) or 1.0
+        n = len(self.doc_ids)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            positions, frequencies = self.postings[term]
+            idf = math.log(1 + (n - len(positions) + 0.5) / (len(positions) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[positions] / average_length)
+            scores[positions] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+        return scores
+
+    # Top-k (doc_id, score) pairs with a positive score, best first
+    def search(self, query, k=10):
+        scores = self._scores(query)
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.doc_ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self, path, meta=None):
+        self.meta = meta or {}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    # The saved index, or None when it is missing or was built for a different index build
+    @staticmethod
+    def load(path, expected_meta=None):
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+        if expected_meta and any(index.meta.get(key) != value for key, value in expected_meta.items()):
+            return None
+        return index
+
+
+# Reciprocal rank fusion: each ranking contributes 1 / (k + rank) for every id it contains
+def reciprocal_rank_fusion(rankings, k=60, limit=None):
+    fused = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] += 1.0 / (k + rank + 1)
+    ordered = sorted(fused.items(), key=lambda item: -item[1])
+    return ordered[:limit] if limit else ordered
@@ -0,0 +1,175 @@
+# Chunk-level corpus store shared by the app and the scrapers.
+# One SQLite table replaces the page-level CSV plus the positional chunk metadata CSVs,
+# and columns are read on demand so startup doesn't load every chunk's text.
+
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from smr_pipeline.crawl_state import snapshot_timestamp
+from smr_pipeline.dedup import DedupReport, dedupe_chunks, drop_repeated_lines_mapped
+from smr_pipeline.embedding_store import text_hash
+
+DEFAULT_PATH = os.environ.get("CHUNK_STORE_PATH", "smr_corpus.db")
+COLUMNS = ("id", "source_url", "archive_url", "snapshot_timestamp", "chunk_offset", "text", "content_hash", "embedding_row")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    source_url TEXT NOT NULL,
+    archive_url TEXT,
+    snapshot_timestamp TEXT,
+    chunk_offset INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    embedding_row INTEGER,
+    UNIQUE (source_url, chunk_offset)
+);
+CREATE INDEX IF NOT EXISTS chunks_embedding_row ON chunks (embedding_row);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class ChunkStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    # One column for every chunk, ordered by chunk id
+    def column(self, name):
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown chunk column {name!r}")
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT {name} FROM chunks ORDER BY id")]
+
+    # Full rows for the given chunk ids, returned in the order asked for
+    def rows(self, ids):
+        ids = [int(i) for i in ids]
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            found = {row["id"]: dict(row) for row in
+                     self._conn.execute(f"SELECT * FROM chunks WHERE id IN ({placeholders})", ids)}
+        return [found[i] for i in ids if i in found]
+
+    def texts(self, ids):
+        return [row["text"] for row in self.rows(ids)]
+
+    # Chunks behind the given vector index positions, in the order asked for
+    def rows_for_embedding_rows(self, embedding_rows):
+        embedding_rows = [int(r) for r in embedding_rows if r >= 0]
+        if not embedding_rows:
+            return []
+        placeholders = ",".join("?" * len(embedding_rows))
+        with self._lock:
+            found = {row["embedding_row"]: dict(row) for row in self._conn.execute(
+                f"SELECT * FROM chunks WHERE embedding_row IN ({placeholders})", embedding_rows)}
+        return [found[r] for r in embedding_rows if r in found]
+
+    # (embedding_row, text) for every chunk in the vector index, in index order
+    def indexed_texts(self):
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(
+                "SELECT embedding_row, text FROM chunks WHERE embedding_row IS NOT NULL ORDER BY embedding_row")]
+
+    # Replace every chunk of one source; chunks is a list of (character offset, text)
+    def replace_source(self, source_url, archive_url, chunks):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE source_url = ?", (source_url,))
+            self._conn.executemany(
+                "INSERT INTO chunks (source_url, archive_url, snapshot_timestamp, chunk_offset, text, content_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(source_url, archive_url, snapshot_timestamp(archive_url), offset, text, text_hash(text))
+                 for offset, text in chunks],
+            )
+            self._conn.commit()
+
+    # Record which vector index row holds each chunk; chunks left out of the index get NULL
+    def set_embedding_rows(self, ids):
+        with self._lock:
+            self._conn.execute("UPDATE chunks SET embedding_row = NULL")
+            self._conn.executemany("UPDATE chunks SET embedding_row = ? WHERE id = ?",
+                                   [(row, int(chunk_id)) for row, chunk_id in enumerate(ids)])
+            self._conn.commit()
+
+    # Changes whenever any chunk is added, removed or edited
+    def fingerprint(self):
+        digest = hashlib.sha256()
+        for chunk_id, content in zip(self.column("id"), self.column("content_hash")):
+            digest.update(f"{chunk_id}:{content}\n".encode())
+        return digest.hexdigest()
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    # (Re)load a scraped CSV (original_url, archive_url, content) when it changed since the last import.
+    # chunker(text) yields (offset, chunk) pairs; by default each page is stored as a single chunk.
+    # Duplicate and near-duplicate chunks are dropped here, before anything downstream embeds them
+    def sync_from_csv(self, csv_path, chunker=None, dedupe=True):
+        stat = os.stat(csv_path)
+        signature = (f"{os.path.abspath(csv_path)}:{stat.st_size}:{stat.st_mtime_ns}:{int(dedupe)}:"
+                     f"{getattr(chunker, 'signature', '')}")
+        if self.get_meta("csv_signature") == signature:
+            return False
+        csv.field_size_limit(sys.maxsize)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        sources = []
+        for row in rows:
+            content = row.get("content") or ""
+            if dedupe:
+                # Chunked without its repeated lines, but offsets still point into the original content
+                content, to_content_offset = drop_repeated_lines_mapped(content)
+                chunks = [(to_content_offset(offset), chunk) for offset, chunk in
+                          (chunker(content) if chunker else [(0, content)])]
+            else:
+                chunks = list(chunker(content)) if chunker else [(0, content)]
+            sources.append((row["original_url"], row.get("archive_url"), chunks))
+        if dedupe:
+            flat = [(i, chunk) for i, (_, _, chunks) in enumerate(sources) for chunk in chunks]
+            keep, report = dedupe_chunks([text for _, (_, text) in flat])
+            kept = [[] for _ in sources]
+            for j in keep:
+                i, chunk = flat[j]
+                kept[i].append(chunk)
+            sources = [(url, archive_url, chunks) for (url, archive_url, _), chunks in zip(sources, kept)]
+            self.set_meta("dedup_report", json.dumps(report.as_dict()))
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+        for url, archive_url, chunks in sources:
+            self.replace_source(url, archive_url, chunks)
+        self.set_meta("csv_signature", signature)
+        return True
+
+    # Counts from the last deduplicated import, with the embedding requests saved at batch_size inputs each, or None
+    def dedup_report(self, batch_size=1):
+        report = self.get_meta("dedup_report")
+        return DedupReport.from_dict(json.loads(report)).as_dict(batch_size) if report else None
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,142 @@
+# Token-aware chunking shared by the app and the scrapers.
+# Text is split at paragraph (line) and sentence boundaries and packed into chunks of at most
+# max_tokens, with the trailing sentences of each chunk repeated at the start of the next as overlap.
+# Chunks are slices of the original text, so (offset, chunk) always satisfies text[offset:].startswith(chunk).
+
+import os
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_TOKENIZER = os.environ.get("CHUNK_TOKENIZER") or ("cl100k_base" if tiktoken is not None else "regex")
+DEFAULT_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", "256"))
+DEFAULT_OVERLAP = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "32"))
+BOUNDARIES = ("sentence", "paragraph")
+# Bumped when the same settings would chunk differently, so stored chunks are rebuilt
+VERSION = 2
+
+_PARAGRAPH_RE = re.compile(r"[^\n]*\S[^\n]*")
+_SENTENCE_RE = re.compile(r"\S.*?(?:[.!?]+[\"')\]]*(?=\s|$)|$)")
+_WORD_RE = re.compile(r"\S+")
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+# Word-and-punctuation count; tracks BPE token counts closely enough for English prose
+class RegexTokenizer:
+    name = "regex"
+
+    def count(self, text):
+        return len(_TOKEN_RE.findall(text))
+
+
+class TiktokenTokenizer:
+    def __init__(self, encoding):
+        self.name = encoding
+        self._encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text):
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+# "regex", or a tiktoken encoding name such as "cl100k_base" when tiktoken is installed
+def get_tokenizer(name=None):
+    name = name or DEFAULT_TOKENIZER
+    if name == "regex":
+        return RegexTokenizer()
+    if tiktoken is None:
+        raise ValueError(f"Tokenizer {name!r} needs tiktoken, which is not installed; use 'regex'")
+    return TiktokenTokenizer(name)
+
+
+def split_sentences(text):
+    return [m.group() for para in _PARAGRAPH_RE.finditer(text or "") for m in _SENTENCE_RE.finditer(para.group().strip())]
+
+
+class Chunker:
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, boundary="sentence", tokenizer=None):
+        if boundary not in BOUNDARIES:
+            raise ValueError(f"Unknown chunk boundary {boundary!r}; expected one of {BOUNDARIES}")
+        if not 0 <= overlap < max_tokens:
+            raise ValueError(f"overlap ({overlap}) must be at least 0 and below max_tokens ({max_tokens})")
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.boundary = boundary
+        self.tokenizer = tokenizer if tokenizer is not None and not isinstance(tokenizer, str) else get_tokenizer(tokenizer)
+
+    # Changes whenever the chunking would, so stores can tell when they need re-chunking
+    @property
+    def signature(self):
+        return f"v{VERSION}:{self.tokenizer.name}:{self.max_tokens}:{self.overlap}:{self.boundary}"
+
+    def _spans(self, text, pattern, start, end):
+        return [m.span() for m in pattern.finditer(text, start, end)]
+
+    # (start, end, tokens) units no larger than max_tokens: paragraphs or sentences, falling back to words
+    # and, for a word too long by itself, slices of it
+    def _units(self, text):
+        for para_start, para_end in self._spans(text, _PARAGRAPH_RE, 0, len(text)):
+            para = text[para_start:para_end]
+            para_start, para_end = para_start + len(para) - len(para.lstrip()), para_end - len(para) + len(para.rstrip())
+            tokens = self.tokenizer.count(text[para_start:para_end])
+            if self.boundary == "paragraph" and tokens <= self.max_tokens:
+                yield para_start, para_end, tokens
+                continue
+            for start, end in self._spans(text, _SENTENCE_RE, para_start, para_end):
+                tokens = self.tokenizer.count(text[start:end])
+                if tokens <= self.max_tokens:
+                    yield start, end, tokens
+                else:
+                    for word_start, word_end in self._spans(text, _WORD_RE, start, end):
+                        tokens = self.tokenizer.count(text[word_start:word_end])
+                        if tokens <= self.max_tokens:
+                            yield word_start, word_end, tokens
+                        else:
+                            yield from self._word_pieces(text, word_start, word_end)
+
+    # A word over max_tokens on its own (a long URL, an encoded blob...) cut into the longest slices that fit
+    def _word_pieces(self, text, start, end):
+        while start < end:
+            low, high = start + 1, end
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.tokenizer.count(text[start:middle]) <= self.max_tokens:
+                    low = middle
+                else:
+                    high = middle - 1
+            yield start, low, self.tokenizer.count(text[start:low])
+            start = low
+
+    # Yields (offset, chunk) for one document
+    def __call__(self, text):
+        text = text or ""
+        window = []
+        size = 0
+        for unit in self._units(text):
+            if window and size + unit[2] > self.max_tokens:
+                yield window[0][0], text[window[0][0]:window[-1][1]]
+                # Carry the trailing units that fit in the overlap budget, always dropping at least one
+                carried = []
+                carried_size = 0
+                for prev in reversed(window[1:]):
+                    if carried_size + prev[2] > self.overlap or carried_size + prev[2] + unit[2] > self.max_tokens:
+                        break
+                    carried.insert(0, prev)
+                    carried_size += prev[2]
+                window, size = carried, carried_size
+            window.append(unit)
+            size += unit[2]
+        if window:
+            yield window[0][0], text[window[0][0]:window[-1][1]]
+
+    # Yields (doc_id, offset, chunk) over an iterable of (doc_id, text) without materialising the corpus
+    def chunk_documents(self, documents):
+        for doc_id, text in documents:
+            for offset, chunk in self(text):
+                yield doc_id, offset, chunk
+
+
+def chunk_text(text, max_tokens=DEFAULT_MAX_TOKENS, overlap=DEFAULT_OVERLAP, boundary="sentence", tokenizer=None):
+    return Chunker(max_tokens, overlap, boundary, tokenizer)(text)
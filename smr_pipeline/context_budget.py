@@ -0,0 +1,84 @@
+# Packs retrieved chunks into each agent's prompt under a token budget.
+# Chunks are taken best score first; sentences already given to this or another agent are removed,
+# a chunk that doesn't fit is trimmed at a sentence boundary, and one that would be too short is dropped.
+
+import logging
+import threading
+
+from smr_pipeline.chunking import get_tokenizer, split_sentences
+from smr_pipeline.dedup import normalize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGETS = {"agent_1": 1200, "agent_2": 1200, "agent_3": 1000}
+MIN_CHUNK_TOKENS = 24
+
+
+class ContextBudgeter:
+    # One per run: the overlap removal spans all agents packed through it
+    def __init__(self, budgets=None, tokenizer=None, min_chunk_tokens=MIN_CHUNK_TOKENS):
+        self.budgets = {**DEFAULT_BUDGETS, **(budgets or {})}
+        self.tokenizer = tokenizer if tokenizer is not None and not isinstance(tokenizer, str) else get_tokenizer(tokenizer)
+        self.min_chunk_tokens = min_chunk_tokens
+        self.report = {}
+        self._used = set()
+        self._lock = threading.Lock()
+
+    # hits: retrieval results with "text" and optionally "score" (higher is better). Returns the chunk texts to use.
+    def pack(self, agent, hits):
+        budget = self.budgets[agent]
+        ranked = sorted(hits, key=lambda hit: -(hit.get("score") or 0.0))
+        packed = []
+        used = 0
+        dropped = trimmed = duplicates = 0
+        with self._lock:
+            for hit in ranked:
+                sentences = [s for s in split_sentences(hit["text"]) if normalize(s) not in self._used]
+                if not sentences:
+                    duplicates += 1
+                    continue
+                remaining = budget - used
+                text = " ".join(sentences)
+                tokens = self.tokenizer.count(text)
+                if tokens > remaining:
+                    kept, tokens = [], 0
+                    for sentence in sentences:
+                        size = self.tokenizer.count(sentence) + 1
+                        if tokens + size > remaining:
+                            break
+                        kept.append(sentence)
+                        tokens += size
+                    if tokens < self.min_chunk_tokens:
+                        dropped += 1
+                        continue
+                    trimmed += 1
+                    sentences, text = kept, " ".join(kept)
+                packed.append(text)
+                used += tokens
+                self._used.update(normalize(s) for s in sentences)
+
+            # Never leave an agent without context when it had candidates; repeat the best chunk, trimmed
+            if not packed and ranked:
+                kept, tokens = [], 0
+                for sentence in split_sentences(ranked[0]["text"]):
+                    size = self.tokenizer.count(sentence) + 1
+                    if tokens + size > budget:
+                        break
+                    kept.append(sentence)
+                    tokens += size
+                if kept:
+                    packed.append(" ".join(kept))
+                    used = tokens
+
+            self.report[agent] = {"candidates": len(hits), "packed": len(packed), "trimmed": trimmed,
+                                  "dropped": dropped, "duplicates": duplicates, "context_tokens": used,
+                                  "budget": budget}
+        return packed
+
+    # Counts the prompt as sent, for the per-run log
+    def record_prompt(self, agent, system_prompt, prompt):
+        tokens = self.tokenizer.count(system_prompt) + self.tokenizer.count(prompt)
+        with self._lock:
+            self.report.setdefault(agent, {})["prompt_tokens"] = tokens
+        logger.info("%s prompt: %d tokens (%s)", agent, tokens, self.report[agent])
+        return tokens
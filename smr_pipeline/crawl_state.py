@@ -0,0 +1,121 @@
+# SQLite crawl state so scraper reruns skip unchanged sources and resume after a crash
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    original_url TEXT PRIMARY KEY,
+    snapshot_timestamp TEXT,
+    archive_url TEXT,
+    http_status INTEGER,
+    content_hash TEXT,
+    content TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS captures (
+    original_url TEXT,
+    time_window TEXT,
+    captures TEXT,
+    fetched_at REAL,
+    PRIMARY KEY (original_url, time_window)
+);
+"""
+
+
+# Wayback archive URLs embed the 14-digit capture time: /web/20240102102315/https://...
+def snapshot_timestamp(archive_url):
+    match = re.search(r"/web/(\d{14})", archive_url or "")
+    return match.group(1) if match else None
+
+
+def content_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    def __init__(self, path="crawl_state.db", max_age_hours=12):
+        self.path = path
+        self.max_age = max_age_hours * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get(self, original_url):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sources WHERE original_url = ?", (original_url,)).fetchone()
+        return dict(row) if row else None
+
+    # Failed fetches and entries older than max_age need their snapshot checked again
+    def is_stale(self, entry):
+        if entry is None or entry["http_status"] != 200:
+            return True
+        return time.time() - (entry["fetched_at"] or 0) > self.max_age
+
+    # The snapshot we already hold is still the latest one, so only its check time moves
+    def is_current(self, entry, archive_url):
+        return (entry is not None and entry["http_status"] == 200
+                and entry["snapshot_timestamp"] == snapshot_timestamp(archive_url))
+
+    def touch(self, original_url):
+        with self._lock:
+            self._conn.execute("UPDATE sources SET fetched_at = ? WHERE original_url = ?", (time.time(), original_url))
+            self._conn.commit()
+
+    # Committed per source so a crash loses at most the fetches still in flight
+    def record(self, original_url, archive_url, http_status, content):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (original_url, snapshot_timestamp(archive_url), archive_url, http_status,
+                 content_hash(content), content, time.time()),
+            )
+            self._conn.commit()
+
+    # Cached CDX capture list for a site and time window, or None when missing or older than max_age
+    def get_captures(self, original_url, time_window):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT captures, fetched_at FROM captures WHERE original_url = ? AND time_window = ?",
+                (original_url, time_window),
+            ).fetchone()
+        if row is None or time.time() - row["fetched_at"] > self.max_age:
+            return None
+        return json.loads(row["captures"])
+
+    def put_captures(self, original_url, time_window, captures):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO captures VALUES (?, ?, ?, ?)",
+                (original_url, time_window, json.dumps(captures), time.time()),
+            )
+            self._conn.commit()
+
+    # Skip fresh sources, keep unchanged snapshots, and fetch only what is new or failed.
+    # scrape(archive_url) returns (content, http_status). Returns the stored entry, or None without an archive.
+    def crawl(self, original_url, resolve_archive_url, scrape):
+        entry = self.get(original_url)
+        if not self.is_stale(entry):
+            print(f" -> Up to date, skipping: {original_url}")
+            return entry
+        archive_url = resolve_archive_url(original_url)
+        if not archive_url:
+            return None
+        if self.is_current(entry, archive_url):
+            print(f" -> Snapshot unchanged, skipping: {archive_url}")
+            self.touch(original_url)
+            return self.get(original_url)
+        print(f" -> Archive found: {archive_url}")
+        content, http_status = scrape(archive_url)
+        self.record(original_url, archive_url, http_status, content)
+        return self.get(original_url)
+
+    def close(self):
+        self._conn.close()
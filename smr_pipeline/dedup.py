@@ -0,0 +1,143 @@
+# Duplicate and near-duplicate removal for chunks before they are embedded.
+# Exact duplicates are caught by a hash of the normalised text, near duplicates by
+# MinHash signatures over word shingles with LSH banding to find candidate pairs.
+
+import bisect
+import hashlib
+import re
+from collections import defaultdict
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join(str(text).casefold().split())
+
+
+# Drop repeated lines inside one document (menus, titles and footers that scrapers pick up several times)
+def drop_repeated_lines(text):
+    return drop_repeated_lines_mapped(text)[0]
+
+
+# drop_repeated_lines, plus a function mapping an offset in its result to the same character in text
+def drop_repeated_lines_mapped(text):
+    seen = set()
+    lines = []
+    # Start of each kept line in the result and in text
+    result_starts, text_starts = [], []
+    result_position = text_position = 0
+    for line in str(text).splitlines(keepends=True):
+        content = line.splitlines()[0]
+        key = normalize(content)
+        if not (key and key in seen):
+            seen.add(key)
+            lines.append(content)
+            result_starts.append(result_position)
+            text_starts.append(text_position)
+            result_position += len(content) + 1
+        text_position += len(line)
+
+    def to_text_offset(offset):
+        line = max(bisect.bisect_right(result_starts, offset) - 1, 0)
+        return text_starts[line] + offset - result_starts[line] if result_starts else offset
+
+    return "\n".join(lines), to_text_offset
+
+
+def _shingles(text, size):
+    words = _WORD_RE.findall(text.casefold())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHasher:
+    def __init__(self, num_perm=64, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+
+    def signature(self, text):
+        shingles = _shingles(text, self.shingle_size)
+        if not shingles:
+            return np.full(self.num_perm, _MERSENNE_PRIME, dtype=np.int64)
+        hashes = np.array([_hash32(s) for s in shingles], dtype=np.int64) % _MERSENNE_PRIME
+        # (a * x + b) mod p for every permutation and shingle; operands stay below 2**31 so int64 can't overflow
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+class DedupReport:
+    def __init__(self, total, exact, near):
+        self.total = total
+        self.exact_duplicates = exact
+        self.near_duplicates = near
+
+    @property
+    def removed(self):
+        return self.exact_duplicates + self.near_duplicates
+
+    @property
+    def kept(self):
+        return self.total - self.removed
+
+    # Embedding inputs (and, at batch_size inputs per request, API calls) that no longer need to be made
+    def saved_embedding_calls(self, batch_size=1):
+        return -(-self.total // batch_size) - -(-self.kept // batch_size)
+
+    # With the embedding requests saved at batch_size inputs per request (e.g. the configured EMBEDDING_BATCH_SIZE)
+    def as_dict(self, batch_size=1):
+        return {"total": self.total, "exact_duplicates": self.exact_duplicates,
+                "near_duplicates": self.near_duplicates, "kept": self.kept,
+                "saved_embedding_inputs": self.removed, "saved_embedding_calls": self.saved_embedding_calls(batch_size)}
+
+    @classmethod
+    def from_dict(cls, counts):
+        return cls(counts["total"], counts["exact_duplicates"], counts["near_duplicates"])
+
+    def __str__(self):
+        return (f"{self.total} chunks: {self.exact_duplicates} exact and {self.near_duplicates} near duplicates "
+                f"removed, {self.kept} kept ({self.removed} embedding inputs saved)")
+
+
+# Indices of the chunks to keep (first occurrence wins) and a report of what was dropped.
+# Near duplicates are chunks whose estimated Jaccard similarity of word shingles reaches threshold.
+def dedupe_chunks(texts, threshold=0.85, num_perm=64, bands=16, shingle_size=3):
+    if num_perm % bands:
+        raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+    rows_per_band = num_perm // bands
+    hasher = MinHasher(num_perm, shingle_size)
+    seen_exact = set()
+    buckets = defaultdict(list)
+    signatures = {}
+    keep = []
+    exact = near = 0
+
+    for i, text in enumerate(texts):
+        key = hashlib.sha256(normalize(text).encode("utf-8")).digest()
+        if key in seen_exact:
+            exact += 1
+            continue
+        seen_exact.add(key)
+
+        signature = hasher.signature(text)
+        band_keys = [(band, signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes())
+                     for band in range(bands)]
+        candidates = {j for band_key in band_keys for j in buckets.get(band_key, ())}
+        if any(np.mean(signatures[j] == signature) >= threshold for j in candidates):
+            near += 1
+            continue
+        signatures[i] = signature
+        for band_key in band_keys:
+            buckets[band_key].append(i)
+        keep.append(i)
+
+    return keep, DedupReport(len(texts), exact, near)
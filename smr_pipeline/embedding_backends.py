@@ -0,0 +1,102 @@
+# Pluggable embedding backends for indexing and queries.
+# A backend is called like the embedders in smr_pipeline.embedding_pipeline (batch -> (vectors, tokens))
+# and also describes itself: identity names the exact model variant (it keys the embedding cache and
+# the index metadata), dim is the vector width, max_in_flight how many batches to run at once.
+
+import logging
+import os
+
+import numpy as np
+
+from smr_pipeline.embedding_pipeline import openai_embedder
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("openai", "local")
+DEFAULT_MODELS = {"openai": "text-embedding-ada-002", "local": "all-MiniLM-L6-v2"}
+OPENAI_DIMS = {"text-embedding-ada-002": 1536, "text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+# Dynamically quantised ONNX export shipped with the sentence-transformers hub models
+ONNX_INT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+
+class OpenAIEmbeddingBackend:
+    name = "openai"
+    max_in_flight = 4
+
+    def __init__(self, client, model=DEFAULT_MODELS["openai"]):
+        self.model = model
+        # Kept as the bare model name so caches built before backends existed stay valid
+        self.identity = model
+        self._embed = openai_embedder(client, model)
+        self._dim = OPENAI_DIMS.get(model)
+
+    @property
+    def dim(self):
+        if self._dim is None:
+            self._dim = self(["dimension probe"])[0].shape[1]
+        return self._dim
+
+    def __call__(self, batch):
+        vectors, tokens = self._embed(batch)
+        self._dim = vectors.shape[1]
+        return vectors, tokens
+
+
+class SentenceTransformerBackend:
+    name = "local"
+    # One batch at a time: the model already spreads each batch over every core
+    max_in_flight = 1
+
+    # quantize="int8" applies dynamic int8 quantisation (torch) or loads the int8 ONNX export (onnx=True);
+    # threads defaults to the number of cores
+    def __init__(self, model=DEFAULT_MODELS["local"], batch_size=64, quantize=None, onnx=False, onnx_file=None,
+                 threads=None, device="cpu"):
+        if quantize not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization {quantize!r}; expected None or 'int8'")
+        self.model = model
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self.onnx = onnx
+        self.onnx_file = onnx_file or (ONNX_INT8_FILE if onnx and quantize == "int8" else None)
+        self.threads = threads or os.cpu_count() or 1
+        self.device = device
+        self.identity = ":".join(["local", model] + (["onnx"] if onnx else []) + ([quantize] if quantize else []))
+        self._model = None
+
+    # Loaded on first use so constructing a backend (e.g. to read its identity) stays cheap
+    def _load(self):
+        if self._model is not None:
+            return self._model
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(self.threads)
+        if self.onnx:
+            model_kwargs = {"file_name": self.onnx_file} if self.onnx_file else None
+            model = SentenceTransformer(self.model, device=self.device, backend="onnx", model_kwargs=model_kwargs)
+        else:
+            model = SentenceTransformer(self.model, device=self.device)
+            if self.quantize == "int8":
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info("Loaded %s on %s with %d threads", self.identity, self.device, self.threads)
+        self._model = model
+        return model
+
+    @property
+    def dim(self):
+        return self._load().get_sentence_embedding_dimension()
+
+    def __call__(self, batch):
+        vectors = self._load().encode(list(batch), batch_size=self.batch_size, convert_to_numpy=True,
+                                      show_progress_bar=False)
+        return np.asarray(vectors, dtype="float32"), None
+
+
+def make_backend(name, model=None, client=None, **options):
+    if name == "openai":
+        if client is None:
+            raise ValueError("The openai embedding backend needs an OpenAI client")
+        return OpenAIEmbeddingBackend(client, model or DEFAULT_MODELS["openai"])
+    if name == "local":
+        return SentenceTransformerBackend(model or DEFAULT_MODELS["local"], **options)
+    raise ValueError(f"Unknown embedding backend {name!r}; expected one of {BACKENDS}")
@@ -0,0 +1,163 @@
+# Batched, concurrent embedding stage shared by the app and the scrapers
+
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from smr_pipeline import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+# Errors caused by the input itself (e.g. a chunk over the model's limit): retrying can't help, but embedding the
+# batch's items one by one isolates the bad chunk. Anything else (rate limits, timeouts...) is transient.
+# openai is only consulted if something already imported it, so this module stays cheap to import.
+def _is_input_error(e):
+    openai = sys.modules.get("openai")
+    return isinstance(e, (ValueError, TypeError)) or (openai is not None and isinstance(e, openai.BadRequestError))
+
+
+# Embed a whole batch in one OpenAI request; returns (vectors, tokens billed)
+def openai_embedder(client, model):
+    def embed(batch):
+        response = client.embeddings.create(model=model, input=batch)
+        data = sorted(response.data, key=lambda item: item.index)
+        tokens = response.usage.total_tokens if getattr(response, "usage", None) else None
+        return np.array([item.embedding for item in data], dtype="float32"), tokens
+    return embed
+
+
+class EmbeddingStats:
+    def __init__(self, total):
+        self.total = total
+        self.cached = 0
+        self.embedded = 0
+        self.failed = []
+        self.tokens = 0
+        self.requests = 0
+        self.elapsed = 0.0
+
+    @property
+    def chunks_per_s(self):
+        return self.embedded / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_s(self):
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.total} chunks: {self.cached} cached, {self.embedded} embedded, "
+                f"{len(self.failed)} failed in {self.elapsed:.1f}s over {self.requests} requests "
+                f"({self.chunks_per_s:.1f} chunks/s, {self.tokens_per_s:.0f} tokens/s)")
+
+
+def _call_with_retry(embed, batch, max_retries, backoff):
+    for attempt in range(max_retries + 1):
+        try:
+            return embed(batch), attempt + 1
+        except Exception as e:
+            if attempt == max_retries or _is_input_error(e):
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning("Embedding batch of %d failed (%s), retrying in %.1fs", len(batch), e, delay)
+            time.sleep(delay)
+
+
+# Embed one batch. If the input is rejected, fall back to single items so one bad chunk can't sink the batch;
+# if it still fails after its retries for any other reason, the whole batch is left missing for the next run.
+def _embed_batch_items(embed, batch, max_retries, backoff):
+    try:
+        (vectors, tokens), calls = _call_with_retry(embed, batch, max_retries, backoff)
+        return [(i, v) for i, v in enumerate(vectors)], [], tokens, calls
+    except Exception as e:
+        if not _is_input_error(e):
+            return [], [(i, e) for i in range(len(batch))], 0, max_retries + 1
+        if len(batch) == 1:
+            return [], [(0, e)], 0, 1
+        calls = 1
+    results, errors, tokens = [], [], 0
+    for i, text in enumerate(batch):
+        try:
+            (vectors, item_tokens), item_calls = _call_with_retry(embed, [text], max_retries, backoff)
+            results.append((i, vectors[0]))
+            tokens += item_tokens or 0
+            calls += item_calls
+        except Exception as e:
+            if _is_input_error(e):
+                errors.append((i, e))
+                calls += 1
+                continue
+            # Transient trouble mid-way: stop rather than spend a failing request on every remaining item
+            errors += [(j, e) for j in range(i, len(batch))]
+            calls += max_retries + 1
+            break
+    return results, errors, tokens or None, calls
+
+
+# Runs on the pool thread, so the span covers the request and its retries but not the wait for a free slot
+def _embed_batch(embed, batch, max_retries, backoff):
+    with telemetry.span("embed.batch", size=len(batch)) as span:
+        results, errors, tokens, calls = _embed_batch_items(embed, batch, max_retries, backoff)
+        span.count(chunks=len(results), failed=len(errors), requests=calls, tokens=tokens)
+        return results, errors, tokens, calls
+
+
+# Embed texts in batches with a bounded number of requests in flight.
+# Returns (vectors, mask, stats); rows where mask is False could not be embedded and are left as zeros.
+def embed_texts(texts, embed, batch_size=64, max_in_flight=4, max_retries=3, backoff=1.0, store=None, dim=None):
+    start = time.perf_counter()
+    stats = EmbeddingStats(len(texts))
+    mask = np.zeros(len(texts), dtype=bool)
+    found = {}
+
+    if store is not None:
+        pending = store.missing(texts)
+        stats.cached = len(texts) - len(pending)
+    else:
+        pending = list(range(len(texts)))
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+            futures = {
+                pool.submit(_embed_batch, embed, [texts[i] for i in batch], max_retries, backoff): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                results, errors, tokens, calls = future.result()
+                stats.requests += calls
+                if tokens is None:
+                    tokens = sum(len(texts[batch[i]].split()) for i, _ in results)
+                stats.tokens += tokens
+                stats.embedded += len(results)
+                for i, e in errors:
+                    stats.failed.append((batch[i], e))
+                if results and store is not None:
+                    store.put_many([texts[batch[i]] for i, _ in results], [v for _, v in results],
+                                   save_keys=False)
+                for i, vector in results:
+                    found[batch[i]] = vector
+    finally:
+        # The cache's key index is written once per call, not once per batch
+        if store is not None:
+            store.flush()
+
+    if store is not None:
+        vectors, mask = store.get_many(texts)
+        if vectors.shape[1] == 0 and dim:
+            vectors = np.zeros((len(texts), dim), dtype="float32")
+    else:
+        if found:
+            dim = len(next(iter(found.values())))
+        vectors = np.zeros((len(texts), dim or 0), dtype="float32")
+        for i, vector in found.items():
+            vectors[i] = vector
+            mask[i] = True
+
+    stats.elapsed = time.perf_counter() - start
+    logger.info("Embedding: %s", stats)
+    return vectors, mask, stats
@@ -0,0 +1,162 @@
+# Content-addressed embedding cache backed by a memory-mapped float32 (or float16) matrix
+
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", ".embedding_cache")
+# float16 halves the cache on disk; lookups still return float32
+DEFAULT_DTYPE = os.environ.get("EMBEDDING_CACHE_DTYPE", "float32")
+VECTOR_FILES = {"float32": "vectors.f32", "float16": "vectors.f16"}
+
+
+# Key chunks by their text rather than their row so edits and reorders don't invalidate the cache
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    # One directory per model: vectors.f32 (or .f16) holds the rows, keys.json maps text hashes to row numbers.
+    # An existing cache keeps the dtype it was created with. Writers in other processes (e.g. a second
+    # server worker) are serialised with a lock file, and keys.json only ever names complete rows.
+    def __init__(self, model, cache_dir=DEFAULT_CACHE_DIR, dtype=None):
+        self.model = model
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        self.keys_path = os.path.join(self.path, "keys.json")
+        self.lock_path = os.path.join(self.path, "lock")
+        self.dim = None
+        self.dtype = dtype or DEFAULT_DTYPE
+        self.keys = {}
+        self._matrix = None
+        self._unsaved = False
+        os.makedirs(self.path, exist_ok=True)
+        meta = self._read_keys()
+        if meta is not None:
+            self.dim = meta["dim"]
+            self.dtype = meta.get("dtype", "float32")
+            self.keys = meta["keys"]
+        if self.dtype not in VECTOR_FILES:
+            raise ValueError(f"Unsupported embedding cache dtype {self.dtype!r}; expected one of {tuple(VECTOR_FILES)}")
+        self.vectors_path = os.path.join(self.path, VECTOR_FILES[self.dtype])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, text):
+        return text_hash(text) in self.keys
+
+    def _read_keys(self):
+        if not os.path.exists(self.keys_path):
+            return None
+        with open(self.keys_path) as f:
+            return json.load(f)
+
+    @contextmanager
+    def _locked(self):
+        with open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @property
+    def _row_bytes(self):
+        return np.dtype(self.dtype).itemsize * self.dim
+
+    # Complete rows in the vector file; a write cut short by a crash can leave a partial row at the end
+    def _rows_on_disk(self):
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // self._row_bytes
+
+    # Memory-map the matrix read-only; rows are paged in only when they are touched
+    def matrix(self):
+        if self._matrix is None:
+            rows = self._rows_on_disk()
+            if rows == 0:
+                return np.zeros((0, self.dim or 0), dtype="float32")
+            self._matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+        return self._matrix
+
+    # Positions of the texts that still need embedding
+    def missing(self, texts):
+        return [i for i, text in enumerate(texts) if text_hash(text) not in self.keys]
+
+    # Cached vectors in input order, plus a mask of which rows were actually found
+    def get_many(self, texts):
+        return self.get_many_by_hash([text_hash(text) for text in texts])
+
+    # Same lookup for callers that already hold the text hashes (e.g. the chunk store)
+    def get_many_by_hash(self, hashes):
+        rows = [self.keys.get(key) for key in hashes]
+        found = np.array([row is not None for row in rows], dtype=bool)
+        vectors = np.zeros((len(hashes), self.dim or 0), dtype="float32")
+        if found.any():
+            matrix = self.matrix()
+            vectors[found] = matrix[[row for row in rows if row is not None]]
+        return vectors, found
+
+    # Appends the new vectors; keys.json is rewritten now, or by flush() when save_keys is False
+    # (embed_texts saves them once per call rather than once per batch)
+    def put_many(self, texts, vectors, save_keys=True):
+        vectors = np.asarray(vectors, dtype="float32")
+        if len(texts) == 0:
+            return
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise ValueError(f"Expected {len(texts)} vectors, got shape {vectors.shape}")
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cached dimension {self.dim}")
+
+        new_rows = {}
+        keep = []
+        for i, text in enumerate(texts):
+            key = text_hash(text)
+            if key not in self.keys and key not in new_rows:
+                new_rows[key] = None
+                keep.append(i)
+        if not keep:
+            return
+
+        # Vectors are appended before their keys are published, after cutting any partial row a crashed
+        # writer left behind, so keys never point at a torn or missing row
+        with self._locked():
+            start = self._rows_on_disk()
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(start * self._row_bytes)
+                f.write(np.ascontiguousarray(vectors[keep], dtype=self.dtype).tobytes())
+            for offset, key in enumerate(new_rows):
+                self.keys[key] = start + offset
+            self._unsaved = True
+            if save_keys:
+                self._write_keys()
+        self._matrix = None
+
+    def flush(self):
+        if self._unsaved:
+            with self._locked():
+                self._write_keys()
+
+    # Merges with keys other processes saved since this store was loaded; the caller holds the lock
+    def _write_keys(self):
+        meta = self._read_keys()
+        if meta is not None and meta["dim"] == self.dim:
+            self.keys = {**meta["keys"], **self.keys}
+        tmp_path = self.keys_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"model": self.model, "dim": self.dim, "dtype": self.dtype, "keys": self.keys}, f)
+        os.replace(tmp_path, self.keys_path)
+        self._unsaved = False
@@ -0,0 +1,242 @@
+# Pluggable HTML text extraction for the scrapers.
+# Each block contributes only its own text, in document order (nested blocks are emitted separately),
+# repeated blocks are dropped, and reading stops once the character budget is met.
+
+import re
+import time
+from collections import deque
+
+from bs4 import BeautifulSoup, Comment, NavigableString
+
+from smr_pipeline import telemetry
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+BLOCK_TAGS = ("p", "div", "article", "section", "main", "header", "footer", "aside", "li", "td", "th",
+              "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6")
+SKIP_TAGS = ("script", "style", "noscript", "template", "svg", "head", "iframe")
+DEFAULT_MAX_CHARS = 10000
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+READ_CHUNK_SIZE = 16 * 1024
+
+
+def available_backends():
+    backends = []
+    if etree is not None:
+        backends.append("lxml")
+    if LexborHTMLParser is not None:
+        backends.append("selectolax")
+    backends.append("bs4")
+    return backends
+
+
+# lxml is preferred because it is the only backend that parses while the body is still downloading
+def default_backend():
+    return available_backends()[0]
+
+
+class _TextCollector:
+    # Whitespace-normalised, de-duplicated blocks up to max_chars
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.blocks = []
+        self.size = 0
+        self._seen = set()
+
+    @property
+    def full(self):
+        return self.size >= self.max_chars
+
+    @staticmethod
+    def normalise(text):
+        return re.sub(r"\s+", " ", text).strip()
+
+    def add(self, text):
+        text = self.normalise(text)
+        if not text or text in self._seen or self.full:
+            return
+        self._seen.add(text)
+        self.blocks.append(text)
+        self.size += len(text) + 1
+
+    def text(self):
+        return "\n".join(self.blocks)[:self.max_chars]
+
+
+# Download and parse figures for the scrape.page span
+class _Meter:
+    def __init__(self):
+        self.bytes = 0
+        self.parse_seconds = 0.0
+
+
+def _response_chunks(response, max_bytes, meter):
+    read = 0
+    try:
+        for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+            meter.bytes += len(chunk)
+            yield chunk
+            read += len(chunk)
+            if read >= max_bytes:
+                break
+    finally:
+        response.close()
+
+
+# Charset from the Content-Type header only; requests' ISO-8859-1 fallback would mangle UTF-8 pages
+def _declared_encoding(response):
+    match = re.search(r"charset=([\w-]+)", response.headers.get("Content-Type", ""), re.I)
+    return match.group(1) if match else None
+
+
+def _read_html(source, max_bytes, meter):
+    if isinstance(source, (str, bytes)):
+        meter.bytes = len(source)
+        return source
+    body = b"".join(_response_chunks(source, max_bytes, meter))
+    return body.decode(_declared_encoding(source) or "utf-8", errors="replace")
+
+
+# A block's own text: its text, its tails and any non-block children (nested blocks contribute separately)
+def _own_text_lxml(elem, tags):
+    parts = [elem.text or ""]
+    for child in elem:
+        if isinstance(child.tag, str) and child.tag not in tags and child.tag not in SKIP_TAGS:
+            parts.append(" ".join(child.itertext()))
+        parts.append(child.tail or "")
+    return " ".join(parts)
+
+
+# Whether the blocks collected so far plus the closed ones waiting on an open parent fill the budget
+def _budget_met(collector, pending):
+    seen = set(collector._seen)
+    size = collector.size
+    for _, text in pending:
+        if text and text not in seen:
+            seen.add(text)
+            size += len(text) + 1
+    return size >= collector.max_chars
+
+
+def _extract_lxml(source, tags, collector, max_bytes, meter):
+    tags = set(tags)
+    if isinstance(source, (str, bytes)):
+        parser = etree.HTMLPullParser(events=("start", "end"), remove_comments=True)
+        chunks = iter([source])
+        meter.bytes = len(source)
+    else:
+        parser = etree.HTMLPullParser(events=("start", "end"), remove_comments=True,
+                                      encoding=_declared_encoding(source))
+        chunks = _response_chunks(source, max_bytes, meter)
+    # Blocks end child-first but are collected in document (start) order, like the other backends: each block
+    # takes a slot when it opens, filled when it closes, and slots reach the collector once all before them are
+    pending = deque()
+    pending_chars = 0
+
+    def drain():
+        nonlocal pending_chars
+        for event, elem in parser.read_events():
+            tag = elem.tag if isinstance(elem.tag, str) else ""
+            if event == "start":
+                if tag in tags:
+                    pending.append([elem, None])
+            elif tag in SKIP_TAGS:
+                elem.clear(keep_tail=True)
+            elif tag in tags:
+                slot = next(slot for slot in reversed(pending) if slot[0] is elem)
+                slot[1] = collector.normalise(_own_text_lxml(elem, tags))
+                pending_chars += len(slot[1]) + 1
+        while pending and pending[0][1] is not None:
+            elem, text = pending.popleft()
+            pending_chars -= len(text) + 1
+            collector.add(text)
+            # Cleared once collected (its enclosing blocks have read their own text by then) to keep memory flat
+            elem.clear(keep_tail=True)
+
+    # Blocks still open (e.g. a page-wide wrapper) contribute the text parsed so far
+    def flush():
+        for elem, text in pending:
+            collector.add(text if text is not None else _own_text_lxml(elem, tags))
+        pending.clear()
+
+    for chunk in chunks:
+        start = time.perf_counter()
+        parser.feed(chunk)
+        drain()
+        meter.parse_seconds += time.perf_counter() - start
+        if collector.size + pending_chars >= collector.max_chars and _budget_met(collector, pending):
+            # Budget met: stop downloading the rest of the page
+            if hasattr(chunks, "close"):
+                chunks.close()
+            flush()
+            return
+    start = time.perf_counter()
+    parser.close()
+    drain()
+    flush()
+    meter.parse_seconds += time.perf_counter() - start
+
+
+def _extract_selectolax(html, tags, collector):
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(list(SKIP_TAGS))
+    for node in tree.css(",".join(tags)):
+        parts = []
+        for child in node.iter(include_text=True):
+            if child.tag == "-text":
+                parts.append(child.text(deep=False))
+            elif not child.tag.startswith("-") and child.tag not in tags:
+                parts.append(child.text(deep=True))
+        collector.add(" ".join(parts))
+        if collector.full:
+            break
+
+
+def _extract_bs4(html, tags, collector):
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup(list(SKIP_TAGS)):
+        element.decompose()
+    for node in soup.find_all(list(tags)):
+        parts = []
+        for child in node.children:
+            if isinstance(child, Comment):
+                continue
+            if isinstance(child, NavigableString):
+                parts.append(str(child))
+            elif child.name not in tags:
+                parts.append(child.get_text(" "))
+        collector.add(" ".join(parts))
+        if collector.full:
+            break
+
+
+# Extract readable text from an HTML string/bytes or a requests response opened with stream=True
+def extract_text(source, backend=None, tags=BLOCK_TAGS, max_chars=DEFAULT_MAX_CHARS, max_bytes=DEFAULT_MAX_BYTES):
+    backend = backend or default_backend()
+    if backend not in available_backends():
+        raise ValueError(f"Extractor backend {backend!r} is not available; installed: {available_backends()}")
+    collector = _TextCollector(max_chars)
+    meter = _Meter()
+    # For a streamed response the span covers the download too; parse_ms is the parser's share of it
+    with telemetry.span("scrape.page", backend=backend) as span:
+        if backend == "lxml":
+            _extract_lxml(source, tags, collector, max_bytes, meter)
+        else:
+            html = _read_html(source, max_bytes, meter)
+            start = time.perf_counter()
+            if backend == "selectolax":
+                _extract_selectolax(html, tags, collector)
+            else:
+                _extract_bs4(html, tags, collector)
+            meter.parse_seconds = time.perf_counter() - start
+        text = collector.text()
+        span.count(bytes=meter.bytes, chars=len(text), parse_ms=meter.parse_seconds * 1000)
+    return text
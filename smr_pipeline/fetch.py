@@ -0,0 +1,125 @@
+# Shared HTTP fetch engine for the archive scrapers: one pooled session,
+# per-host politeness and a global concurrency cap
+
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from smr_pipeline import telemetry
+
+# Overridable so the scrapers can run against a local stand-in (see benchmarks/fake_wayback.py)
+WAYBACK_AVAILABLE_URL = os.environ.get("WAYBACK_AVAILABLE_URL", "http://archive.org/wayback/available")
+DEFAULT_TIMEOUT = 10
+USER_AGENT = "smr-agent-scraper/1.0 (+https://github.com/aguhob/smr-agent-scrape2)"
+
+
+def make_session(pool_size=20):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+class HostRateLimiter:
+    # Spaces requests to the same host; every *.archive.org host draws from one shared budget
+    def __init__(self, default_interval=0.2, archive_interval=1.0):
+        self.default_interval = default_interval
+        self.archive_interval = archive_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        if host == "archive.org" or host.endswith(".archive.org"):
+            return "archive.org", self.archive_interval
+        return host, self.default_interval
+
+    def wait(self, url):
+        bucket, interval = self._bucket(url)
+        # Reserve the next free slot under the lock, sleep outside it so other hosts keep moving
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(bucket, now))
+            self._next_slot[bucket] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Fetcher:
+    def __init__(self, session=None, limiter=None, timeout=DEFAULT_TIMEOUT):
+        self.session = session or make_session()
+        self.limiter = limiter or HostRateLimiter()
+        self.timeout = timeout
+
+    def get(self, url, **kwargs):
+        self.limiter.wait(url)
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    # Closest Wayback snapshot for site_url (optionally near a YYYYMMDD timestamp), or None
+    def latest_archive_url(self, site_url, timestamp=None):
+        params = {"url": site_url}
+        if timestamp:
+            params["timestamp"] = timestamp
+        with telemetry.span("scrape.lookup", site=site_url) as span:
+            try:
+                response = self.get(WAYBACK_AVAILABLE_URL, params=params)
+            except requests.RequestException as e:
+                print(f"Wayback lookup failed for {site_url}: {e}")
+                span.error = f"{type(e).__name__}: {e}"
+                return None
+            span.set(status=response.status_code)
+            if response.status_code == 200:
+                try:
+                    return response.json()["archived_snapshots"]["closest"]["url"]
+                except (KeyError, ValueError):
+                    return None
+            return None
+
+
+# Run fn over items on a bounded thread pool, handing each result to on_result as soon as it completes
+def run_concurrently(items, fn, max_workers=8, on_result=None):
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error processing {item}: {e}")
+                continue
+            if on_result is not None:
+                on_result(item, result)
+            results.append(result)
+    return results
+
+
+class CsvResultWriter:
+    # Appends rows as they arrive so a partial run still leaves usable output on disk
+    def __init__(self, path, fieldnames):
+        self.path = path
+        self.fieldnames = fieldnames
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self._file = open(self.path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        self._writer.writeheader()
+        return self
+
+    def write(self, row):
+        with self._lock:
+            self._writer.writerow(row)
+            self._file.flush()
+
+    def __exit__(self, *exc):
+        self._file.close()
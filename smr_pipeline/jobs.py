@@ -0,0 +1,263 @@
+# SQLite-backed job queue with a local worker pool.
+# A job runs its kind's stages in order; each stage's result is saved as soon as it finishes,
+# so a failed stage can be retried (automatically with backoff, or later through retry())
+# without redoing the stages before it. Running stages can publish partial progress for pollers.
+# The pool lives in one process; jobs left queued or running by a previous process are resumed by recover().
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from smr_pipeline import telemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.environ.get("JOB_QUEUE_PATH", "jobs.db")
+STATUSES = ("queued", "running", "done", "failed")
+# Partial progress is written at most this often, so token streams don't turn into a write per token
+PUBLISH_INTERVAL = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    payload TEXT NOT NULL,
+    results TEXT NOT NULL DEFAULT '{}',
+    stages TEXT NOT NULL DEFAULT '{}',
+    progress TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    created_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS artifacts (
+    job_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    data BLOB NOT NULL,
+    created_at REAL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+JSON_COLUMNS = ("payload", "results", "stages", "progress")
+
+
+class JobStage:
+    # fn(job) -> a JSON-serialisable result; retried up to retries times, waiting backoff * 2**attempt
+    def __init__(self, name, fn, retries=0, backoff=2.0):
+        self.name = name
+        self.fn = fn
+        self.retries = retries
+        self.backoff = backoff
+
+
+class Job:
+    # What a stage function sees: the payload, earlier stages' results, its artifacts and a way to publish progress
+    def __init__(self, queue, job_id, payload, results):
+        self.id = job_id
+        self.payload = payload
+        self.results = results
+        self._queue = queue
+        self._progress = {}
+        self._published = 0.0
+        self._lock = threading.Lock()
+
+    def publish(self, key, value, force=False):
+        with self._lock:
+            self._progress[key] = value
+            now = time.monotonic()
+            if not force and now - self._published < PUBLISH_INTERVAL:
+                return
+            self._published = now
+            progress = dict(self._progress)
+        self._queue._update(self.id, progress=progress)
+
+    def flush(self):
+        with self._lock:
+            progress = dict(self._progress)
+        if progress:
+            self._queue._update(self.id, progress=progress)
+
+    # Binary outputs (e.g. a rendered report) stored with the job, through the queue the stage runs in
+    def put_artifact(self, name, data):
+        self._queue.put_artifact(self.id, name, data)
+
+    def get_artifact(self, name):
+        return self._queue.get_artifact(self.id, name)
+
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_PATH, max_workers=2):
+        self.path = path
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job-worker")
+
+    def register(self, kind, stages):
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names for job kind {kind!r}: {names}")
+        self._handlers[kind] = list(stages)
+
+    def submit(self, kind, payload):
+        if kind not in self._handlers:
+            raise ValueError(f"No stages registered for job kind {kind!r}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now),
+            )
+            self._conn.commit()
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    # Re-run a failed job from the stage that failed
+    def retry(self, job_id):
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', error = NULL, updated_at = ? WHERE id = ? AND status = 'failed'",
+                (time.time(), job_id),
+            ).rowcount
+            self._conn.commit()
+        if updated:
+            self._pool.submit(self._run, job_id)
+        return bool(updated)
+
+    # Resume jobs a previous process left unfinished; returns their ids
+    def recover(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        job_ids = [job_id for job_id, kind in rows if kind in self._handlers]
+        for job_id in job_ids:
+            self._update(job_id, status="queued")
+            self._pool.submit(self._run, job_id)
+        return job_ids
+
+    def get(self, job_id):
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            columns = [d[0] for d in cursor.description]
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        for column in JSON_COLUMNS:
+            job[column] = json.loads(job[column])
+        return job
+
+    # Binary outputs (e.g. a rendered PDF) kept with the job instead of as files in the working directory
+    def put_artifact(self, job_id, name, data):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (job_id, name, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, name, sqlite3.Binary(data), time.time()),
+            )
+            self._conn.commit()
+
+    def get_artifact(self, job_id, name):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM artifacts WHERE job_id = ? AND name = ?", (job_id, name)).fetchone()
+        return bytes(row[0]) if row else None
+
+    # Drop finished jobs (and their artifacts) older than max_age_days; returns how many were removed
+    def prune(self, max_age_days):
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM artifacts WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?)",
+                (cutoff,),
+            )
+            removed = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (cutoff,)
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: dict(rows).get(status, 0) for status in STATUSES}
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        for column in JSON_COLUMNS:
+            if column in fields:
+                fields[column] = json.dumps(fields[column])
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    # Runs on a worker, whose future nobody reads: an error outside a stage function (e.g. a result that isn't
+    # JSON-serialisable, or a locked database) must still fail the job rather than leave it running forever
+    def _run(self, job_id):
+        try:
+            self._run_stages(job_id)
+        except Exception as e:
+            logger.exception("Job %s failed outside its stages", job_id)
+            try:
+                record = self.get(job_id)
+                stages = record["stages"] if record else {}
+                if record and record["stage"] in stages:
+                    info = stages[record["stage"]]
+                    # The attempt count is only saved between attempts, so it can lag the one that broke
+                    info.update(status="failed", error=f"{type(e).__name__}: {e}", attempts=max(1, info.get("attempts", 0)))
+                self._update(job_id, status="failed", stages=stages, error=traceback.format_exc())
+            except Exception:
+                logger.exception("Could not mark job %s failed", job_id)
+
+    def _run_stages(self, job_id):
+        record = self.get(job_id)
+        if record is None or record["status"] != "queued":
+            return
+        results, stage_info = record["results"], record["stages"]
+        job = Job(self, job_id, record["payload"], results)
+        job._progress = record["progress"]
+        self._update(job_id, status="running")
+        for stage in self._handlers[record["kind"]]:
+            if stage_info.get(stage.name, {}).get("status") == "done":
+                continue
+            info = stage_info.setdefault(stage.name, {"attempts": 0})
+            info["status"] = "running"
+            self._update(job_id, stage=stage.name, stages=stage_info)
+            for attempt in range(stage.retries + 1):
+                info["attempts"] += 1
+                start = time.perf_counter()
+                try:
+                    with telemetry.span(f"job.{stage.name}", kind=record["kind"], attempt=info["attempts"]):
+                        results[stage.name] = stage.fn(job)
+                except Exception as e:
+                    info["error"] = f"{type(e).__name__}: {e}"
+                    info["seconds"] = round(time.perf_counter() - start, 3)
+                    if attempt < stage.retries:
+                        self._update(job_id, stages=stage_info)
+                        time.sleep(stage.backoff * 2 ** attempt)
+                        continue
+                    info["status"] = "failed"
+                    job.flush()
+                    self._update(job_id, status="failed", stages=stage_info, error=traceback.format_exc())
+                    return
+                info.update(status="done", error=None, seconds=round(time.perf_counter() - start, 3))
+                job.flush()
+                self._update(job_id, results=results, stages=stage_info)
+                break
+        self._update(job_id, status="done", stage=None)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+        self._conn.close()
@@ -0,0 +1,52 @@
+# Builds expensive resources on a background thread so the UI can render before they exist.
+# The build function receives the loader to report progress (step) and non-fatal problems (warn).
+
+import threading
+import time
+
+
+class BackgroundLoader:
+    def __init__(self, build, name="resources"):
+        self.name = name
+        self.status = "starting"
+        self.warnings = []
+        self.error = None
+        self.seconds = None
+        self._build = build
+        self._value = None
+        self._done = threading.Event()
+        self._started = time.perf_counter()
+        threading.Thread(target=self._run, name=f"load-{name}", daemon=True).start()
+
+    def _run(self):
+        try:
+            self._value = self._build(self)
+            self.status = "ready"
+        except Exception as e:
+            self.error = e
+            self.status = "failed"
+        finally:
+            self.seconds = time.perf_counter() - self._started
+            self._done.set()
+
+    def step(self, status):
+        self.status = status
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    # Blocks until the build finishes; re-raises its error
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} still loading after {timeout}s ({self.status})")
+        if self.error is not None:
+            raise self.error
+        return self._value
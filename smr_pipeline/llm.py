@@ -0,0 +1,49 @@
+# Chat completion helpers for the agents
+
+from smr_pipeline import telemetry
+
+# Stream a chat completion, handing each text delta to on_token as it arrives; returns the full text.
+# The llm.chat span records token usage (sent in a final chunk) and time to first token (also as llm.ttft).
+def stream_chat(client, model, system_prompt, prompt, on_token=None):
+    with telemetry.span("llm.chat", model=model) as span:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                span.count(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    telemetry.observe("llm.ttft", span.elapsed(), model=model)
+                parts.append(delta)
+                if on_token is not None:
+                    on_token(delta)
+        span.count(chars=sum(len(part) for part in parts))
+        return "".join(parts)
+
+
+# Serve a cached response when allowed (replayed through on_token so the UI looks the same),
+# otherwise stream a fresh completion and store it. bypass skips the lookup but still refreshes the entry.
+def cached_stream_chat(cache, client, model, system_prompt, prompt, on_token=None, bypass=False, similar=False):
+    if cache is not None and not bypass:
+        with telemetry.span("llm.cache_lookup", model=model, similar=similar) as span:
+            cached = cache.get(model, system_prompt, prompt, similar=similar)
+            span.count(hits=int(cached is not None))
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached)
+            return cached
+    text = stream_chat(client, model, system_prompt, prompt, on_token=on_token)
+    if cache is not None:
+        cache.put(model, system_prompt, prompt, text)
+    return text
@@ -0,0 +1,129 @@
+# Persistent LLM response cache keyed by model, system prompt and rendered prompt,
+# with an optional similarity mode that reuses a response for a near-identical prompt
+
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL,
+    last_used REAL,
+    hits INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+# Prompts are truncated before embedding so they stay within the embedding model's input limit
+SIMILARITY_MAX_CHARS = 8000
+
+
+def _digest(*parts):
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    # embed(batch) -> (vectors, tokens) enables similarity hits at or above similarity_threshold (cosine)
+    def __init__(self, path="llm_cache.db", max_entries=1000, embed=None, similarity_threshold=0.98):
+        self.path = path
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._pending_embeddings = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _embed(self, prompt):
+        vectors, _ = self.embed([prompt[:SIMILARITY_MAX_CHARS]])
+        vector = np.asarray(vectors[0], dtype="float32")
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _touch(self, key):
+        self._conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+
+    def get(self, model, system_prompt, prompt, similar=False):
+        scope = _digest(model, system_prompt)
+        key = _digest(model, system_prompt, prompt)
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._touch(key)
+                self.hits += 1
+                return row[0]
+        vector = None
+        if similar and self.embed is not None:
+            # An embedding API error only costs the similarity lookup, never the agent call
+            try:
+                vector = self._embed(prompt)
+            except Exception:
+                vector = None
+        if vector is not None:
+            with self._lock:
+                self._pending_embeddings[key] = vector
+                # Only embeddings from a backend of the same width are comparable; others are ignored
+                rows = self._conn.execute(
+                    "SELECT key, response, embedding FROM responses "
+                    "WHERE scope = ? AND embedding IS NOT NULL AND length(embedding) = ?",
+                    (scope, vector.nbytes),
+                ).fetchall()
+                if rows:
+                    matrix = np.vstack([np.frombuffer(r[2], dtype="float32") for r in rows])
+                    scores = matrix @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        self._touch(rows[best][0])
+                        self.hits += 1
+                        self.similar_hits += 1
+                        return rows[best][1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model, system_prompt, prompt, response):
+        scope = _digest(model, system_prompt)
+        key = _digest(model, system_prompt, prompt)
+        # Only prompts looked up in similarity mode were embedded; the rest are stored without an embedding
+        # rather than paying for an embedding request on the way to the next agent
+        with self._lock:
+            vector = self._pending_embeddings.pop(key, None)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO responses (key, scope, response, embedding, created_at, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0) ON CONFLICT (key) DO UPDATE SET response = excluded.response, "
+                "embedding = COALESCE(excluded.embedding, responses.embedding), created_at = excluded.created_at, "
+                "last_used = excluded.last_used, hits = 0",
+                (key, scope, response, vector.tobytes() if vector is not None else None, now, now),
+            )
+            # Evict least recently used entries beyond the size bound
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": size,
+        }
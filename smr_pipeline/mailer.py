@@ -0,0 +1,207 @@
+# Report email delivery over a configurable SMTP endpoint.
+# Defaults match Gmail (STARTTLS on 587 with a login); a local stand-in such as
+#   python benchmarks/smtp_sink.py --port 1025
+# needs starttls=False and no username.
+# MailDelivery keeps one authenticated connection open between sends and drains queued
+# messages over it in batches, so a burst of reports pays for one TLS and login handshake.
+
+import queue
+import smtplib
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from email.message import EmailMessage
+
+import numpy as np
+
+from smr_pipeline import telemetry
+
+DEFAULT_TIMEOUT = 30
+# Connection-level failures worth one reconnect and resend; anything else (e.g. a refused recipient) is the message's
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class SmtpSettings:
+    def __init__(self, host="smtp.gmail.com", port=587, username=None, password=None, starttls=True,
+                 timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"SmtpSettings({self.host}:{self.port}, starttls={self.starttls}, login={bool(self.username)})"
+
+
+def report_message(sender, to, subject, body, attachment=None, attachment_name=None, cc=None):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = to
+    if cc:
+        msg["Cc"] = cc
+    msg.set_content(body)
+    if attachment is not None:
+        msg.add_attachment(attachment, maintype="application", subtype="pdf", filename=attachment_name)
+    return msg
+
+
+def connect(settings):
+    with telemetry.span("smtp.connect", host=settings.host, starttls=settings.starttls):
+        server = smtplib.SMTP(settings.host, settings.port, timeout=settings.timeout)
+        try:
+            if settings.starttls:
+                server.starttls()
+            if settings.username:
+                server.login(settings.username, settings.password)
+        except Exception:
+            server.close()
+            raise
+    return server
+
+
+# One-off send on a fresh connection
+def send_message(settings, msg):
+    with connect(settings) as server, telemetry.span("smtp.send"):
+        server.send_message(msg)
+
+
+class MailDelivery:
+    # A connection idle for health_check_after seconds is checked with NOOP before reuse,
+    # and one idle for idle_timeout seconds is closed (servers drop idle clients anyway).
+    # The futures of the last max_keys messages submitted with a key are kept for resubmissions.
+    def __init__(self, settings, max_batch=20, health_check_after=10.0, idle_timeout=120.0, latency_samples=1000,
+                 max_keys=1000):
+        self.settings = settings
+        self.max_batch = max_batch
+        self.health_check_after = health_check_after
+        self.idle_timeout = idle_timeout
+        self.max_keys = max_keys
+        self._submitted = OrderedDict()
+        self._queue = queue.Queue()
+        self._server = None
+        self._last_used = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_samples)
+        self._handshakes = deque(maxlen=latency_samples)
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.health_checks = 0
+
+    # Queue a message; the Future resolves once the server has accepted it. Resubmitting under the same key
+    # (e.g. from a retried job) returns that message's queued or delivered Future instead of sending it again;
+    # only a failed delivery is queued anew.
+    def submit(self, msg, key=None):
+        with self._lock:
+            future = self._submitted.get(key) if key is not None else None
+            if future is not None and not (future.done() and future.exception() is not None):
+                return future
+            future = Future()
+            if key is not None:
+                self._submitted[key] = future
+                self._submitted.move_to_end(key)
+                while len(self._submitted) > self.max_keys:
+                    self._submitted.popitem(last=False)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mail-delivery", daemon=True)
+                self._thread.start()
+            self._queue.put((msg, future))
+        return future
+
+    def send(self, msg, timeout=None, key=None):
+        return self.submit(msg, key=key).result(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.batches += 1
+            for msg, future in batch:
+                self._deliver(msg, future)
+
+    def _connection(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.health_check_after:
+            self.health_checks += 1
+            try:
+                healthy = self._server.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                healthy = False
+            if not healthy:
+                self._disconnect()
+                self.reconnects += 1
+        if self._server is None:
+            start = time.perf_counter()
+            self._server = connect(self.settings)
+            self._handshakes.append(time.perf_counter() - start)
+            self.connects += 1
+        return self._server
+
+    def _disconnect(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+    # The smtp.send span includes any health check, reconnect and resend, as the caller waits for them
+    def _deliver(self, msg, future):
+        start = time.perf_counter()
+        with telemetry.span("smtp.send") as span:
+            for attempt in range(2):
+                span.set(attempts=attempt + 1)
+                try:
+                    result = self._connection().send_message(msg)
+                except RECONNECT_ERRORS as e:
+                    self._disconnect()
+                    if attempt == 0:
+                        self.reconnects += 1
+                        continue
+                    error = e
+                except Exception as e:
+                    error = e
+                else:
+                    self._last_used = time.monotonic()
+                    self._latencies.append(time.perf_counter() - start)
+                    self.sent += 1
+                    future.set_result(result)
+                    return
+                break
+            span.error = f"{type(error).__name__}: {error}"
+        self.failed += 1
+        future.set_exception(error)
+
+    def stats(self):
+        latencies = np.array(self._latencies) * 1000
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "batches": self.batches,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "health_checks": self.health_checks,
+            "queued": self._queue.qsize(),
+            "send_p50_ms": round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+            "send_p95_ms": round(float(np.percentile(latencies, 95)), 1) if len(latencies) else None,
+            "handshake_ms": round(float(np.mean(self._handshakes)) * 1000, 1) if self._handshakes else None,
+        }
+
+    def close(self):
+        self._disconnect()
@@ -0,0 +1,64 @@
+# Bounded LRU + TTL caches for query embeddings and retrieval results
+
+import threading
+import time
+from collections import OrderedDict
+
+
+# Streamlit reruns and resubmissions differ only in case and spacing more often than in content
+def normalize_query(text):
+    return " ".join(str(text).casefold().split())
+
+
+class TTLCache:
+    # Thread-safe LRU cache whose entries also expire ttl seconds after they were stored
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    # Drop everything cached against an older index once a rebuilt one is in use
+    def bind_version(self, version):
+        with self._lock:
+            if self.version != version:
+                self._data.clear()
+                self.version = version
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+        }
@@ -0,0 +1,137 @@
+# Query-time retrieval over the vector index, the BM25 index and the chunk store,
+# with cached query embeddings and results
+
+import numpy as np
+
+from smr_pipeline import telemetry
+from smr_pipeline.bm25 import reciprocal_rank_fusion
+from smr_pipeline.query_cache import normalize_query
+from smr_pipeline.vector_index import search_subset
+
+# vector: dense only; lexical: BM25 only; hybrid: both, fused by reciprocal rank
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+
+
+class Retriever:
+    # embed(batch) -> (vectors, tokens): an embedder from smr_pipeline.embedding_pipeline or a backend
+    # from smr_pipeline.embedding_backends; model names it in cache keys and errors
+    # prefilter > 0 restricts the dense search to that many top BM25 candidates, scored exactly;
+    # hybrid mode fuses candidate_factor * k hits from each side
+    def __init__(self, index, chunk_store, embed, model, index_version, embedding_cache=None, result_cache=None,
+                 bm25=None, mode="vector", prefilter=0, candidate_factor=4):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+        if (mode != "vector" or prefilter) and bm25 is None:
+            raise ValueError("Lexical retrieval and prefiltering need a BM25 index")
+        self.bm25 = bm25
+        self.mode = mode
+        self.prefilter = prefilter
+        self.candidate_factor = candidate_factor
+        self.index = index
+        self.chunk_store = chunk_store
+        self.embed = embed
+        self.model = model
+        self.index_version = index_version
+        self.embedding_cache = embedding_cache
+        self.result_cache = result_cache
+        if result_cache is not None:
+            result_cache.bind_version(index_version)
+
+    # Query vectors stacked in input order; uncached queries are embedded together in one request
+    def embed_queries(self, queries):
+        keys = [(normalize_query(query), self.model) for query in queries]
+        vectors = [self.embedding_cache.get(key) if self.embedding_cache is not None else None for key in keys]
+        # Queries that normalise to the same key are embedded once
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+        if missing:
+            with telemetry.span("embed.query", model=self.model) as span:
+                span.count(queries=len(missing))
+                embedded, _ = self.embed([queries[positions[0]] for positions in missing.values()])
+            for (key, positions), vector in zip(missing.items(), embedded):
+                vector = np.asarray(vector, dtype="float32")
+                for i in positions:
+                    vectors[i] = vector
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put(key, vector)
+        vectors = np.vstack(vectors).astype("float32")
+        if self.index is not None and vectors.shape[1] != self.index.d:
+            raise ValueError(f"{self.model} produces {vectors.shape[1]}-dimensional query vectors "
+                             f"but the index holds {self.index.d}-dimensional vectors; rebuild it with the same backend")
+        return vectors
+
+    def embed_query(self, query):
+        return self.embed_queries([query])[0]
+
+    # Dense hits per query as (index rows, distances); one batched search unless lexical prefiltering applies
+    def _dense_search(self, queries, k):
+        vectors = self.embed_queries(queries)
+        with telemetry.span("index.search", k=k, prefilter=self.prefilter) as span:
+            span.count(queries=len(queries))
+            if not self.prefilter:
+                distances, indices = self.index.search(vectors, k)
+                return list(zip(indices, distances))
+            hits = []
+            for query, vector in zip(queries, vectors):
+                candidates = [doc_id for doc_id, _ in self.bm25.search(query, self.prefilter)]
+                if candidates:
+                    distances, indices = search_subset(self.index, vector.reshape(1, -1), k, candidates)
+                else:
+                    distances, indices = self.index.search(vector.reshape(1, -1), k)
+                hits.append((indices[0], distances[0]))
+            return hits
+
+    def _rank(self, queries, k):
+        fetch = k * self.candidate_factor if self.mode == "hybrid" else k
+        dense = self._dense_search(queries, fetch) if self.mode != "lexical" else [((), ())] * len(queries)
+        ranked = []
+        for query, (rows, distances) in zip(queries, dense):
+            distance_by_row = {int(r): float(d) for r, d in zip(rows, distances) if r >= 0}
+            if self.mode == "vector":
+                order = [(row, None) for row in distance_by_row]
+            else:
+                lexical = self.bm25.search(query, fetch)
+                if self.mode == "lexical":
+                    order = lexical
+                else:
+                    order = reciprocal_rank_fusion([list(distance_by_row), [row for row, _ in lexical]])
+            ranked.append([(row, score, distance_by_row.get(row)) for row, score in order[:k]])
+        return ranked
+
+    # One embedding request and one vectorised index search for all uncached queries.
+    # Returns, per query, the k best chunks as dicts with chunk_id, text, distance (L2, lower is closer;
+    # None for lexical-only hits), score (BM25 or fused rank score; None in vector mode), source_url,
+    # archive_url and snapshot_timestamp.
+    def search_many(self, queries, k=3):
+        queries = list(queries)
+        keys = [(normalize_query(query), self.model, self.index_version, self.mode, self.prefilter, k)
+                for query in queries]
+        results = [self.result_cache.get(key) if self.result_cache is not None else None for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            with telemetry.span("retrieve", mode=self.mode) as span:
+                span.count(queries=len(missing))
+                for i, ranked in zip(missing, self._rank([queries[i] for i in missing], k)):
+                    by_row = {row["embedding_row"]: row for row in
+                              self.chunk_store.rows_for_embedding_rows([row for row, _, _ in ranked])}
+                    results[i] = tuple(
+                        {
+                            "chunk_id": by_row[r]["id"],
+                            "text": by_row[r]["text"],
+                            "distance": distance,
+                            "score": score,
+                            "source_url": by_row[r]["source_url"],
+                            "archive_url": by_row[r]["archive_url"],
+                            "snapshot_timestamp": by_row[r]["snapshot_timestamp"],
+                        }
+                        for r, score, distance in ranked if r in by_row
+                    )
+                    if self.result_cache is not None:
+                        self.result_cache.put(keys[i], results[i])
+        return [[dict(hit) for hit in result] for result in results]
+
+    # Texts of the k nearest chunks for a single query
+    def search(self, query, k=3):
+        return [hit["text"] for hit in self.search_many([query], k)[0]]
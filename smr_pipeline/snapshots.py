@@ -0,0 +1,105 @@
+# Wayback snapshot resolution through the CDX API: one request per site lists every
+# capture in the time window, and a policy picks which of them to scrape
+
+import datetime
+import json
+import os
+
+import requests
+
+from smr_pipeline import telemetry
+
+# Snapshot pages and the CDX API; both overridable to point at a local stand-in (see benchmarks/fake_wayback.py)
+WAYBACK_WEB_URL = os.environ.get("WAYBACK_WEB_URL", "http://web.archive.org").rstrip("/")
+CDX_URL = os.environ.get("WAYBACK_CDX_URL", f"{WAYBACK_WEB_URL}/cdx/search/cdx")
+CDX_FIELDS = ["timestamp", "original", "statuscode", "digest"]
+POLICIES = ("newest", "closest", "per_year")
+
+
+def archive_url(capture):
+    return f"{WAYBACK_WEB_URL}/web/{capture['timestamp']}/{capture['original']}"
+
+
+def _parse_timestamp(timestamp):
+    return datetime.datetime.strptime(timestamp[:14].ljust(14, "0"), "%Y%m%d%H%M%S")
+
+
+# All successful captures of site_url between the two years, at most one per day
+def fetch_captures(fetcher, site_url, from_year, to_year):
+    params = {
+        "url": site_url,
+        "from": str(from_year),
+        "to": str(to_year),
+        "output": "json",
+        "fl": ",".join(CDX_FIELDS),
+        "filter": "statuscode:200",
+        "collapse": "timestamp:8",
+    }
+    with telemetry.span("scrape.cdx", site=site_url) as span:
+        response = fetcher.get(CDX_URL, params=params)
+        response.raise_for_status()
+        rows = response.json() if response.text.strip() else []
+        span.count(bytes=len(response.content), captures=max(len(rows) - 1, 0))
+    if not rows:
+        return []
+    header = rows[0]
+    return [dict(zip(header, row)) for row in rows[1:]]
+
+
+# Pick captures by policy: the newest one, the one closest to `target` (YYYYMMDD...), or the newest in each year
+def select_snapshots(captures, policy="newest", target=None, years=None):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown snapshot policy {policy!r}; expected one of {POLICIES}")
+    if not captures:
+        return []
+    if policy == "newest":
+        return [max(captures, key=lambda c: c["timestamp"])]
+    if policy == "closest":
+        if not target:
+            raise ValueError("The 'closest' policy needs a target timestamp")
+        target_time = _parse_timestamp(target)
+        return [min(captures, key=lambda c: abs(_parse_timestamp(c["timestamp"]) - target_time))]
+    by_year = {}
+    for capture in captures:
+        year = capture["timestamp"][:4]
+        if years and year not in years:
+            continue
+        if year not in by_year or capture["timestamp"] > by_year[year]["timestamp"]:
+            by_year[year] = capture
+    return [by_year[year] for year in sorted(by_year, reverse=True)]
+
+
+class SnapshotResolver:
+    # Capture lists are cached in the crawl state database so reruns within max_age make no CDX calls
+    def __init__(self, fetcher, from_year, to_year, policy="newest", target=None, years=None, state=None):
+        self.fetcher = fetcher
+        self.from_year = from_year
+        self.to_year = to_year
+        self.policy = policy
+        self.target = target
+        self.years = years
+        self.state = state
+
+    def captures(self, site_url):
+        window = f"{self.from_year}-{self.to_year}"
+        if self.state is not None:
+            cached = self.state.get_captures(site_url, window)
+            if cached is not None:
+                return cached
+        try:
+            captures = fetch_captures(self.fetcher, site_url, self.from_year, self.to_year)
+        except (requests.RequestException, json.JSONDecodeError) as e:
+            print(f"CDX lookup failed for {site_url}: {e}")
+            return []
+        if self.state is not None:
+            self.state.put_captures(site_url, window, captures)
+        return captures
+
+    # Archive URLs chosen by the policy, newest first
+    def resolve(self, site_url):
+        chosen = select_snapshots(self.captures(site_url), self.policy, self.target, self.years)
+        return [archive_url(capture) for capture in chosen]
+
+    def resolve_one(self, site_url):
+        urls = self.resolve(site_url)
+        return urls[0] if urls else None
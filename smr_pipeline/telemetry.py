@@ -0,0 +1,251 @@
+# Lightweight tracing and metrics for the scrape, index, retrieve and agent pipeline.
+# A span times one unit of work (a Wayback lookup, an embedding batch, an index search, an LLM call...)
+# and carries attributes describing it (model, status...) and counts measured in it (bytes, tokens...).
+# Spans opened inside another span in the same context record it as their parent.
+# Finished spans feed per-stage p50/p95 and count totals, are appended
+# to a JSONL file when TELEMETRY_PATH is set, and are exported as Prometheus text (written to
+# TELEMETRY_PROMETHEUS_PATH, e.g. for node_exporter's textfile collector, when that is set).
+#   python -m smr_pipeline.telemetry spans.jsonl              # p50/p95 per stage of a recorded run
+#   python -m smr_pipeline.telemetry spans.jsonl --prometheus # the same run as Prometheus text
+
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_PATH = os.environ.get("TELEMETRY_PATH") or None
+DEFAULT_PROMETHEUS_PATH = os.environ.get("TELEMETRY_PROMETHEUS_PATH") or None
+# Percentiles cover each stage's most recent WINDOW spans; counts, sums and totals cover all of them
+WINDOW = 2048
+# The Prometheus file is rewritten at most this often
+PROMETHEUS_INTERVAL = 10.0
+METRIC_PREFIX = "smr_stage"
+
+_current = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class Span:
+    def __init__(self, name, attrs, parent):
+        self.name = name
+        self.attrs = attrs
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.seconds = None
+        self.error = None
+        self.counts = {}
+        self._started = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    # Quantities summed per stage across spans, e.g. count(bytes=len(body))
+    def count(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + (value or 0)
+
+    # Seconds since the span opened, e.g. for time to first token
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "seconds": round(self.seconds, 6),
+            "error": self.error,
+            "attrs": self.attrs,
+            "counts": self.counts,
+        }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Tracer:
+    def __init__(self, path=DEFAULT_PATH, prometheus_path=DEFAULT_PROMETHEUS_PATH, window=WINDOW):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.window = window
+        self._lock = threading.Lock()
+        self._file = None
+        self._prometheus_written = 0.0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._durations = defaultdict(lambda: deque(maxlen=self.window))
+            self._counts = defaultdict(int)
+            self._sums = defaultdict(float)
+            self._errors = defaultdict(int)
+            self._totals = defaultdict(int)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        span = Span(name, attrs, _current.get())
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            span.seconds = span.elapsed()
+            self._finish(span)
+
+    # A duration measured inside another span (e.g. time to first token), recorded as a stage of its own
+    def observe(self, name, seconds, **attrs):
+        span = Span(name, attrs, _current.get())
+        span.seconds = seconds
+        self._finish(span)
+
+    def _finish(self, span):
+        with self._lock:
+            self._add(span.name, span.seconds, span.error, span.counts)
+            if self.path:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(json.dumps(span.as_dict(), default=str) + "\n")
+                self._file.flush()
+            write_prometheus = (self.prometheus_path
+                                and time.monotonic() - self._prometheus_written > PROMETHEUS_INTERVAL)
+            if write_prometheus:
+                self._prometheus_written = time.monotonic()
+        if write_prometheus:
+            self.write_prometheus(self.prometheus_path)
+
+    def _add(self, name, seconds, error, counts):
+        self._durations[name].append(seconds)
+        self._counts[name] += 1
+        self._sums[name] += seconds
+        if error:
+            self._errors[name] += 1
+        for key, value in counts.items():
+            self._totals[(name, key)] += value
+
+    # {stage: {"count", "errors", "p50_s", "p95_s", "mean_s", "totals": {count name: sum}}}, sorted by stage
+    def _stages(self):
+        with self._lock:
+            stages = {}
+            for name in sorted(self._counts):
+                p50, p95 = np.percentile(np.array(self._durations[name]), [50, 95])
+                stages[name] = {
+                    "count": self._counts[name],
+                    "errors": self._errors[name],
+                    "p50_s": float(p50),
+                    "p95_s": float(p95),
+                    "sum_s": self._sums[name],
+                    "totals": {key: value for (stage, key), value in sorted(self._totals.items()) if stage == name},
+                }
+        return stages
+
+    # Per stage: count, errors, p50/p95/mean in milliseconds and count totals
+    def summary(self):
+        return {
+            name: {
+                "count": stage["count"],
+                "errors": stage["errors"],
+                "p50_ms": round(stage["p50_s"] * 1000, 1),
+                "p95_ms": round(stage["p95_s"] * 1000, 1),
+                "mean_ms": round(stage["sum_s"] / stage["count"] * 1000, 1),
+                "totals": stage["totals"],
+            }
+            for name, stage in self._stages().items()
+        }
+
+    def prometheus(self):
+        stages = self._stages()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_seconds Span durations per pipeline stage (quantiles over the last {self.window} spans)",
+            f"# TYPE {METRIC_PREFIX}_seconds summary",
+        ]
+        for name, stage in stages.items():
+            label = f'stage="{_label(name)}"'
+            lines.append(f'{METRIC_PREFIX}_seconds{{{label},quantile="0.5"}} {stage["p50_s"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_seconds{{{label},quantile="0.95"}} {stage["p95_s"]:.6f}')
+            lines.append(f"{METRIC_PREFIX}_seconds_sum{{{label}}} {stage['sum_s']:.6f}")
+            lines.append(f"{METRIC_PREFIX}_seconds_count{{{label}}} {stage['count']}")
+        lines += [f"# HELP {METRIC_PREFIX}_errors_total Spans that raised, per stage",
+                  f"# TYPE {METRIC_PREFIX}_errors_total counter"]
+        lines += [f'{METRIC_PREFIX}_errors_total{{stage="{_label(name)}"}} {stage["errors"]}'
+                  for name, stage in stages.items()]
+        lines += [f"# HELP {METRIC_PREFIX}_count_total Quantities counted in spans (bytes, tokens, ...), per stage",
+                  f"# TYPE {METRIC_PREFIX}_count_total counter"]
+        lines += [f'{METRIC_PREFIX}_count_total{{stage="{_label(name)}",count="{_label(key)}"}} {value:g}'
+                  for name, stage in stages.items() for key, value in stage["totals"].items()]
+        return "\n".join(lines) + "\n"
+
+    # Written to a temporary file and renamed so a scraper never reads half a file
+    def write_prometheus(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    # Fold the spans of a JSONL file (e.g. from a scraper run) into a tracer that only summarises them
+    @classmethod
+    def from_jsonl(cls, path):
+        tracer = cls(path=None, prometheus_path=None)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    tracer._add(record["name"], record["seconds"], record.get("error"), record.get("counts") or {})
+        return tracer
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# The process-wide tracer every module reports to; a short-lived run (e.g. a scraper) still leaves its final metrics
+tracer = Tracer()
+if tracer.prometheus_path:
+    atexit.register(lambda: tracer.write_prometheus(tracer.prometheus_path))
+
+
+def span(name, **attrs):
+    return tracer.span(name, **attrs)
+
+
+def observe(name, seconds, **attrs):
+    tracer.observe(name, seconds, **attrs)
+
+
+def format_summary(summary):
+    lines = [f"{'stage':<22}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}"]
+    for name, stage in summary.items():
+        lines.append(f"{name:<22}{stage['count']:>7}{stage['errors']:>8}{stage['p50_ms']:>10.1f}"
+                     f"{stage['p95_ms']:>10.1f}{stage['mean_ms']:>10.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise the spans recorded in a telemetry JSONL file")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--prometheus", action="store_true", help="print Prometheus text instead of a table")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("pass a JSONL path or set TELEMETRY_PATH")
+    recorded = Tracer.from_jsonl(args.path)
+    if args.prometheus:
+        print(recorded.prometheus(), end="")
+    else:
+        print(format_summary(recorded.summary()))
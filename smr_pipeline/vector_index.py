@@ -0,0 +1,152 @@
+# FAISS index factory with persisted build artifacts.
+# Kinds: flat (exact), fp16 and sq8 (exact search over float16 / 8-bit scalar-quantized vectors),
+# ivf (IVF-Flat), hnsw, ivfpq (IVF with product-quantized vectors).
+# Saved indexes can be memory-mapped so every worker process shares one copy through the page cache.
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ("flat", "fp16", "sq8", "ivf", "hnsw", "ivfpq")
+SCALAR_QUANTIZERS = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+# IO_FLAG_MMAP_IFC (faiss >= 1.8) maps the stored vectors in place; plain IO_FLAG_MMAP only maps IVF lists
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+MAX_TRAIN_SAMPLE = 50000
+_direct_map_lock = threading.Lock()
+
+
+# Index file for a kind, kept next to the chunk store: smr_corpus.db -> smr_corpus.hnsw.faiss
+def index_path(chunk_store_path, kind):
+    return f"{os.path.splitext(chunk_store_path)[0]}.{kind}.faiss"
+
+
+# FAISS wants ~39 training points per list; keep nlist near 4*sqrt(n) within that limit
+def default_nlist(n):
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _train_sample(vectors, size, seed=0):
+    if len(vectors) <= size:
+        return vectors
+    rows = np.random.default_rng(seed).choice(len(vectors), size=size, replace=False)
+    return vectors[np.sort(rows)]
+
+
+def _pq_subquantizers(dim, requested):
+    m = requested or next(m for m in (64, 48, 32, 24, 16, 8, 4, 2, 1) if dim % m == 0)
+    if dim % m:
+        raise ValueError(f"PQ subquantizers ({m}) must divide the vector dimension ({dim})")
+    return m
+
+
+def build_index(vectors, kind="flat", nlist=None, nprobe=8, hnsw_m=32, ef_construction=80, ef_search=64,
+                pq_m=None, train_sample=MAX_TRAIN_SAMPLE):
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}; expected one of {INDEX_KINDS}")
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+
+    # Quantized kinds need enough points to train on; tiny corpora fall back to exact search
+    min_points = {"ivf": 39, "ivfpq": 256 * 39}.get(kind, 0)
+    if n < min_points:
+        logger.warning("%d vectors are too few to train a %s index; using flat", n, kind)
+        kind = "flat"
+
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind in SCALAR_QUANTIZERS:
+        index = faiss.IndexScalarQuantizer(dim, SCALAR_QUANTIZERS[kind], faiss.METRIC_L2)
+        # 8-bit codes need per-dimension value ranges; training is a no-op for fp16
+        index.train(_train_sample(vectors, train_sample))
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim, pq_m), 8)
+        index.train(_train_sample(vectors, train_sample))
+    index.add(vectors)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+
+# Query-time knobs; harmless on kinds that don't use them
+def set_search_params(index, nprobe=8, ef_search=64):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+        # Built up front so the first prefiltered search (search_subset) doesn't pay for it
+        _ensure_direct_map(index)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+# Short, stable id for an index build; caches keyed on it go stale as soon as the index is rebuilt
+def index_version(meta):
+    return hashlib.sha256(json.dumps(meta, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# IVF indexes can only look vectors up by id once they have a direct map (row -> list position)
+def _ensure_direct_map(index):
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return
+    with _direct_map_lock:
+        if ivf.direct_map.type == faiss.DirectMap.NoMap:
+            ivf.make_direct_map()
+
+
+# Exact search over the given index rows (e.g. lexical candidates), whatever the index kind. The rows' stored
+# vectors are scored directly rather than through the index's own search, which for IVF and HNSW would only
+# see the candidates that fall in the probed lists or on the graph walk. Results are padded with -1 like FAISS's.
+def search_subset(index, queries, k, rows):
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    rows = np.unique(np.asarray(rows, dtype="int64"))
+    _ensure_direct_map(index)
+    vectors = index.reconstruct_batch(rows)
+    distances = ((queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :])
+    distances = np.maximum(distances, 0)
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    found_distances = np.full((len(queries), k), np.finfo("float32").max, dtype="float32")
+    found_rows = np.full((len(queries), k), -1, dtype="int64")
+    found_distances[:, :order.shape[1]] = np.take_along_axis(distances, order, axis=1)
+    found_rows[:, :order.shape[1]] = rows[order]
+    return found_distances, found_rows
+
+
+def save_index(index, path, meta):
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+    with open(path + ".json", "w") as f:
+        json.dump(meta, f)
+
+
+# The persisted index, or None when it is missing or was built for different data or settings.
+# With mmap=True the vectors stay in the file (read-only) instead of being copied into this process.
+def load_index(path, expected_meta, mmap=False):
+    meta_path = path + ".json"
+    if not (os.path.exists(path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    mismatched = {key: (meta.get(key), value) for key, value in expected_meta.items() if meta.get(key) != value}
+    if mismatched:
+        logger.info("Not reusing %s, built with different settings (saved, wanted): %s", path, mismatched)
+        return None
+    index = faiss.read_index(path, MMAP_FLAGS if mmap else 0)
+    if "dim" in meta and index.d != meta["dim"]:
+        raise ValueError(f"{path} holds {index.d}-dimensional vectors but its metadata says {meta['dim']}")
+    return index
@@ -1,60 +1,253 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import datetime
+import threading
 import requests
-import faiss
-import smtplib
-from fpdf import FPDF
-from email.message import EmailMessage
-from openai import OpenAI
+from smr_pipeline import telemetry
+from smr_pipeline.agent_graph import run_graph
+from smr_pipeline.agents import AGENT_MODEL, agent_stages
+from smr_pipeline.context_budget import DEFAULT_BUDGETS, ContextBudgeter
+from smr_pipeline.jobs import JobQueue, JobStage
+from smr_pipeline.lazy import BackgroundLoader
+from smr_pipeline.llm import cached_stream_chat
+from smr_pipeline.llm_cache import ResponseCache
+from smr_pipeline.mailer import MailDelivery, SmtpSettings, report_message
+from smr_pipeline.query_cache import TTLCache
 
 # Fix Unicode issues for PDF export
 def clean_text(text):
     return text.encode("latin1", "replace").decode("latin1")
 
-# Load the scraped nuclear sources
-df_sources = pd.read_csv("scraped_smr_sources.csv")
-embedding_model = "text-embedding-ada-002"
+# The scraped nuclear sources, loaded into the chunk store as token-bounded chunks
+# (re-imported only when the CSV or the chunker settings change)
+CORPUS_CSV = "scraped_smr_sources.csv"
+# openai (text-embedding-ada-002 by default) or local (a SentenceTransformer model on CPU, no API calls);
+# indexes record the backend, model and dimension, so switching rebuilds them instead of mixing vectors
+EMBEDDING_BACKEND = st.secrets.get("EMBEDDING_BACKEND", "openai")
+# flat (exact), fp16 or sq8 (exact over compact vectors), ivf, hnsw or ivfpq; the built index is persisted
+# next to the chunk store and memory-mapped, so Streamlit workers share one copy through the page cache
+VECTOR_INDEX_KIND = st.secrets.get("VECTOR_INDEX_KIND", "flat")
+VECTOR_INDEX_MMAP = st.secrets.get("VECTOR_INDEX_MMAP", True)
 
+# Query embeddings and top-k results survive reruns; results are dropped whenever the index is rebuilt
 @st.cache_resource
-def embed_sources_and_build_index():
+def load_retrieval_caches():
+    return TTLCache(maxsize=2048, ttl=24 * 3600), TTLCache(maxsize=1024, ttl=3600)
+
+query_embedding_cache, retrieval_result_cache = load_retrieval_caches()
+
+# Everything retrieval needs, built off the script thread; heavy imports (openai, faiss, torch) happen here
+def build_resources(loader):
+    import numpy as np
+    from openai import OpenAI
+    from smr_pipeline.bm25 import BM25Index, bm25_path
+    from smr_pipeline.chunk_store import ChunkStore
+    from smr_pipeline.chunking import Chunker
+    from smr_pipeline.embedding_backends import make_backend
+    from smr_pipeline.embedding_pipeline import embed_texts
+    from smr_pipeline.embedding_store import EmbeddingStore
+    from smr_pipeline.retrieval import Retriever
+    from smr_pipeline.vector_index import build_index, index_path, index_version, load_index, save_index, set_search_params
+
     client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    texts = df_sources["content"].astype(str).tolist()
-    embeddings = []
-    for i, text in enumerate(texts):
-        try:
-            response = client.embeddings.create(model=embedding_model, input=text)
-            embeddings.append(np.array(response.data[0].embedding, dtype="float32"))
-        except Exception as e:
-            st.warning(f"Embedding failed for chunk {i}: {e}")
-            embeddings.append(np.zeros(1536, dtype="float32"))
-    index = faiss.IndexFlatL2(1536)
-    index.add(np.array(embeddings))
-    return index, texts
-
-faiss_index, nuclear_chunks = embed_sources_and_build_index()
+    if EMBEDDING_BACKEND == "local":
+        embedding_backend = make_backend(
+            "local",
+            model=st.secrets.get("EMBEDDING_MODEL"),
+            batch_size=int(st.secrets.get("EMBEDDING_BATCH_SIZE", 64)),
+            quantize=st.secrets.get("EMBEDDING_QUANTIZE"),
+            onnx=st.secrets.get("EMBEDDING_ONNX", False),
+        )
+    else:
+        embedding_backend = make_backend(EMBEDDING_BACKEND, model=st.secrets.get("EMBEDDING_MODEL"), client=client)
 
-def retrieve_relevant_chunks(user_query, k=3):
+    loader.step("loading sources")
+    chunk_store = ChunkStore()
+    chunk_store.sync_from_csv(CORPUS_CSV, chunker=Chunker())
+
+    loader.step("loading vector index")
+    ids = np.array(chunk_store.column("id"), dtype="int64")
+    # Reuse the saved index when it was built from exactly these chunks with every chunk embedded
+    path = index_path(chunk_store.path, VECTOR_INDEX_KIND)
+    index_meta = {
+        "kind": VECTOR_INDEX_KIND,
+        "embedding_backend": embedding_backend.name,
+        "embedding_model": embedding_backend.identity,
+        "dim": embedding_backend.dim,
+        "corpus": chunk_store.fingerprint(),
+        "count": len(ids),
+    }
+    index = load_index(path, index_meta, mmap=VECTOR_INDEX_MMAP)
+    if index is None:
+        store = EmbeddingStore(embedding_backend.identity, dtype=st.secrets.get("EMBEDDING_CACHE_DTYPE"))
+        embeddings, mask = store.get_many_by_hash(chunk_store.column("content_hash"))
+        if embeddings.shape[1] == 0:
+            embeddings = np.zeros((len(ids), embedding_backend.dim), dtype="float32")
+        # Only chunks that are new or changed since the last run are read from the store and embedded
+        missing = np.flatnonzero(~mask)
+        if len(missing):
+            loader.step(f"embedding {len(missing)} chunks")
+            new_embeddings, new_mask, stats = embed_texts(
+                chunk_store.texts(ids[missing]),
+                embedding_backend,
+                batch_size=int(st.secrets.get("EMBEDDING_BATCH_SIZE", 64)),
+                max_in_flight=int(st.secrets.get("EMBEDDING_MAX_IN_FLIGHT", embedding_backend.max_in_flight)),
+                store=store,
+                dim=embeddings.shape[1],
+            )
+            for i, e in stats.failed:
+                loader.warn(f"Embedding failed for chunk {ids[missing[i]]}: {e}")
+            embeddings[missing] = new_embeddings
+            mask[missing] = new_mask
+        # Chunks that could not be embedded are left out of the index rather than indexed as zero vectors
+        loader.step("building vector index")
+        index = build_index(embeddings[mask], kind=VECTOR_INDEX_KIND)
+        chunk_store.set_embedding_rows(ids[mask])
+        index_meta["count"] = int(mask.sum())
+        save_index(index, path, index_meta)
+        if VECTOR_INDEX_MMAP:
+            # Swap the freshly built in-memory copy for the shared, mapped file
+            del embeddings, index
+            index = load_index(path, index_meta, mmap=True)
+    set_search_params(index)
+    version = index_version(index_meta)
+
+    # BM25 over the indexed chunks, persisted next to the vector index and rebuilt whenever it is
+    loader.step("loading lexical index")
+    bm25_file = bm25_path(path)
+    bm25 = BM25Index.load(bm25_file, {"version": version})
+    if bm25 is None:
+        indexed = chunk_store.indexed_texts()
+        bm25 = BM25Index.build([row for row, _ in indexed], [text for _, text in indexed])
+        bm25.save(bm25_file, {"version": version})
+
+    retriever = Retriever(
+        index,
+        chunk_store,
+        embedding_backend,
+        embedding_backend.identity,
+        version,
+        embedding_cache=query_embedding_cache,
+        result_cache=retrieval_result_cache,
+        bm25=bm25,
+        # hybrid fuses BM25 and dense rankings so exact names (vendors, sites) aren't missed
+        mode=st.secrets.get("RETRIEVAL_MODE", "hybrid"),
+        prefilter=int(st.secrets.get("LEXICAL_PREFILTER", 0)),
+    )
+    return {"client": client, "embedding_backend": embedding_backend, "chunk_store": chunk_store, "retriever": retriever}
+
+# Started once per server process; the form below renders while it loads
+@st.cache_resource
+def load_resources():
+    return BackgroundLoader(build_resources, name="knowledge base")
+
+# Job workers and the response cache outlive script runs; they reach the loader through this slot,
+# which every run points at the current one, so a retried load reaches them too
+@st.cache_resource
+def load_resource_slot():
+    return {}
+
+resources = load_resources()
+resource_slot = load_resource_slot()
+resource_slot["loader"] = resources
+
+# Blocks until the knowledge base is built; re-raises a failed build
+def knowledge_base():
+    return resource_slot["loader"].result()
+
+# One embedding request and one index search for the whole batch of queries.
+# Returns more candidates than fit in a prompt; ContextBudgeter picks from them.
+def retrieve_many(queries, k=6, warn=st.warning):
     try:
-        client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-        response = client.embeddings.create(model=embedding_model, input=user_query)
-        query_embedding = np.array(response.data[0].embedding, dtype="float32").reshape(1, -1)
-        distances, indices = faiss_index.search(query_embedding, k)
-        return [nuclear_chunks[i] for i in indices[0] if i < len(nuclear_chunks)]
+        return knowledge_base()["retriever"].search_many(queries, k)
     except Exception as e:
-        st.warning(f"Retrieval error: {e}")
-        return []
+        warn(f"Retrieval error: {e}")
+        return [[] for _ in queries]
+
+def retrieve_relevant_chunks(user_query, k=3):
+    return [hit["text"] for hit in retrieve_many([user_query], k)[0]]
+
+# Per-agent context token budgets, e.g. CONTEXT_TOKEN_BUDGET = 1500 or {agent_3 = 800} under [CONTEXT_TOKEN_BUDGETS]
+CONTEXT_BUDGETS = {
+    agent: int(st.secrets.get("CONTEXT_TOKEN_BUDGETS", {}).get(agent, st.secrets.get("CONTEXT_TOKEN_BUDGET", budget)))
+    for agent, budget in DEFAULT_BUDGETS.items()
+}
 
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
 EMAIL_SENDER = st.secrets["EMAIL_SENDER"]
 EMAIL_PASSWORD = st.secrets["EMAIL_PASSWORD"]
 EMAIL_RECIPIENT = st.secrets["EMAIL_RECIPIENT"]
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+# Point SMTP_SERVER/SMTP_PORT at a local stand-in (with SMTP_STARTTLS = false, SMTP_LOGIN = false) for testing
+SMTP_SETTINGS = SmtpSettings(
+    st.secrets.get("SMTP_SERVER", "smtp.gmail.com"),
+    st.secrets.get("SMTP_PORT", 587),
+    username=EMAIL_SENDER if st.secrets.get("SMTP_LOGIN", True) else None,
+    password=EMAIL_PASSWORD,
+    starttls=st.secrets.get("SMTP_STARTTLS", True),
+)
+JOB_POLL_INTERVAL = 0.3
+LOADING_POLL_INTERVAL = 1.0
 
 st.title("Infrastructure AI Agent Pipeline")
 
+# Readiness of the background build; analyses submitted before it finishes wait for it in the job worker
+def show_readiness():
+    if resources.ready:
+        st.success(f"Knowledge base ready ({resources.seconds:.1f}s)")
+    elif resources.done:
+        st.error(f"Knowledge base failed to load: {resources.error}")
+        # A failed loader would otherwise stay cached for the life of the server
+        if st.button("Retry loading the knowledge base"):
+            load_resources.clear()
+            st.rerun()
+    else:
+        st.info(f"Knowledge base loading: {resources.status}...")
+    for message in resources.warnings:
+        st.warning(message)
+
+# Refreshes itself while the build runs, then reruns the page once it has finished
+@st.fragment(run_every=LOADING_POLL_INTERVAL)
+def follow_loading():
+    if resources.done:
+        st.rerun()
+    show_readiness()
+
+with st.sidebar:
+    if resources.done:
+        show_readiness()
+    else:
+        follow_loading()
+
+# Identical (or, optionally, near-identical) agent prompts are answered from a persistent cache
+@st.cache_resource
+def load_response_cache():
+    return ResponseCache(
+        "llm_cache.db",
+        max_entries=int(st.secrets.get("LLM_CACHE_MAX_ENTRIES", 1000)),
+        # Resolved per call so the cache is usable before the embedding backend has loaded
+        embed=lambda batch: knowledge_base()["embedding_backend"](batch),
+    )
+
+response_cache = load_response_cache()
+
+with st.sidebar.expander("Response cache"):
+    similar_prompts = st.checkbox("Reuse answers for near-identical prompts", value=False)
+    bypass_cache = {
+        agent: st.checkbox(f"Bypass cache for Agent {agent[-1]}", value=False)
+        for agent in ("agent_1", "agent_2", "agent_3")
+    }
+    st.table([{key: f"{value:.0%}" if key == "hit_rate" else value for key, value in response_cache.stats().items()}])
+
+with st.sidebar.expander("Retrieval cache"):
+    st.table([
+        {"Cache": name, **{key: f"{value:.0%}" if key == "hit_rate" else value for key, value in cache.stats().items()}}
+        for name, cache in (("Query embeddings", query_embedding_cache), ("Top-k results", retrieval_result_cache))
+    ])
+
+with st.sidebar.expander("Corpus dedup"):
+    dedup_report = (resources.result()["chunk_store"].dedup_report(int(st.secrets.get("EMBEDDING_BATCH_SIZE", 64)))
+                    if resources.ready else None)
+    if dedup_report:
+        st.table([dedup_report])
+
 project_name = st.text_input("Project Name")
 location = st.text_input("Location")
 
@@ -110,114 +303,195 @@ known_partners = st.text_input("Who are Some Known Developers, Vendors or Partne
 user_name = st.text_input("Your Name")
 user_email = st.text_input("Your Contact Email")
 
-if st.button("Run Full Agent Analysis"):
-    with st.spinner("Running Agent 1: Strategic Recommendation..."):
-        agent1_chunks = retrieve_relevant_chunks(f"{project_name} {location} {', '.join(power_type)}")
-        agent1_prompt = f"""
-You are Agent 1, a strategic infrastructure advisor.
-Context from recent nuclear-related sources:
-{"".join(['- ' + chunk + '\\n' for chunk in agent1_chunks])}
-
-Evaluate the following:
-Project: {project_name} in {location}
-Power Type: {', '.join(power_type)}
-Infrastructure Type: {', '.join(infra_type)}
-Objectives: {', '.join(strategic_objectives)}
-Known Risks: {', '.join(anticipated_risks)}
-Constraints: {', '.join(timeline_constraints)}
-Partners: {known_partners}
-
-Respond with:
-1) Summary of risks,
-2) Strategic Recommendation,
-3) One-sentence rationale,
-4) Rationale details.
-"""
-        agent1 = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a strategic advisor."},
-                {"role": "user", "content": agent1_prompt}
-            ]
-        )
-        agent1_output = agent1.choices[0].message.content
-
-    with st.spinner("Running Agent 2: Risk Identification..."):
-        agent2_chunks = retrieve_relevant_chunks(f"{project_name} {', '.join(strategic_objectives)}")
-        agent2_prompt = f"""
-You are Agent 2, a nuclear infrastructure risk translator.
-Context from recent nuclear-related sources:
-{"".join(['- ' + chunk + '\\n' for chunk in agent2_chunks])}
-
-Identify 3–5 core risks in:
-Project: {project_name}, Objectives: {', '.join(strategic_objectives)}
-
-Output format:
-- Risk Type
-- Description
-- Urgency Level (Low, Medium, High)
-"""
-        agent2 = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a nuclear risk analyst."},
-                {"role": "user", "content": agent2_prompt}
-            ]
-        )
-        agent2_output = agent2.choices[0].message.content
-
-    with st.spinner("Running Agent 3: Mitigation Planning..."):
-        agent3_chunks = retrieve_relevant_chunks(agent2_output)
-        agent3_prompt = f"""
-You are Agent 3, a mitigation planner for nuclear infrastructure projects.
-Context from nuclear-specific sources:
-{"".join(['- ' + chunk + '\\n' for chunk in agent3_chunks])}
-
-Based on these risks:
-{agent2_output}
-
-Generate:
-- Mitigation Strategy per risk
-- Clear and actionable execution steps
-"""
-        agent3 = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a risk mitigation strategist."},
-                {"role": "user", "content": agent3_prompt}
-            ]
+AGENT_TITLES = {
+    "agent_1": "Agent 1: Strategic Recommendation",
+    "agent_2": "Agent 2: Risk Identification",
+    "agent_3": "Agent 3: Mitigation Planning",
+}
+
+# One persistent SMTP connection shared by every job's email stage
+@st.cache_resource
+def load_mail_delivery():
+    return MailDelivery(SMTP_SETTINGS)
+
+mail_delivery = load_mail_delivery()
+
+# Background job stages: the agents, then PDF rendering and email as separately retried steps
+def run_agents_stage(job):
+    project = job.payload["project"]
+    client = knowledge_base()["client"]
+    budgeter = ContextBudgeter(CONTEXT_BUDGETS)
+    streamed = {agent: "" for agent in AGENT_TITLES}
+    warnings = []
+    lock = threading.Lock()
+
+    def on_token(agent, token):
+        with lock:
+            streamed[agent] += token
+            job.publish("streamed", dict(streamed))
+
+    def warn(message):
+        warnings.append(message)
+        job.publish("warnings", list(warnings), force=True)
+
+    def complete(agent, system_prompt, prompt):
+        budgeter.record_prompt(agent, system_prompt, prompt)
+        return cached_stream_chat(
+            response_cache, client, AGENT_MODEL, system_prompt, prompt,
+            on_token=lambda token: on_token(agent, token),
+            bypass=job.payload["bypass_cache"][agent],
+            similar=job.payload["similar_prompts"],
         )
-        agent3_output = agent3.choices[0].message.content
-
-    # Generate and download PDF
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, f"Project Summary\nDate: {datetime.datetime.now().strftime('%Y-%m-%d')}\nProject: {project_name}\nLocation: {location}\nPower Type: {', '.join(power_type)}\nInfrastructure Type: {', '.join(infra_type)}\nObjectives: {', '.join(strategic_objectives)}\nPartners: {known_partners}")
-    pdf.ln(5)
-    pdf.multi_cell(0, 10, clean_text(f"Agent 1 Output:\n{agent1_output}"))
-    pdf.add_page()
-    pdf.multi_cell(0, 10, clean_text(f"Agent 2 Risk Summary:\n{agent2_output}"))
-    pdf.add_page()
-    pdf.multi_cell(0, 10, clean_text(f"Agent 3 Mitigation Plan:\n{agent3_output}"))
-    pdf_path = f"{project_name.replace(' ', '_')}_AI_Plan.pdf"
-    pdf.output(pdf_path)
-    st.download_button("Download PDF", file_name=pdf_path.split("/")[-1], data=open(pdf_path, "rb"), mime="application/pdf")
-
-    # Email results
-    msg = EmailMessage()
-    msg["Subject"] = f"AI Project Review: {project_name}"
-    msg["From"] = EMAIL_SENDER
-    msg["To"] = user_email
-    msg["Cc"] = EMAIL_RECIPIENT
-    msg.set_content(clean_text(f"Hello {user_name},\n\nAttached is your full AI analysis for the project: {project_name}."))
-    with open(pdf_path, "rb") as f:
-        msg.add_attachment(f.read(), maintype="application", subtype="pdf", filename=pdf_path.split("/")[-1])
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        server.send_message(msg)
-
-    st.success("PDF emailed to stakeholder!")
-    st.markdown("### ✅ Submission Complete")
-    st.markdown(f"Thanks, **{user_name}**! A copy of your AI-generated project review has been emailed to you and logged for internal review.")
+
+    results, timings = run_graph(agent_stages(
+        project, lambda queries: retrieve_many(queries, warn=warn), complete, pack=budgeter.pack,
+    ))
+    return {
+        "outputs": {agent: results[agent] for agent in AGENT_TITLES},
+        "timings": timings,
+        "prompt_tokens": budgeter.report,
+    }
+
+def render_pdf_stage(job):
+    project = job.payload["project"]
+    outputs = job.results["agents"]["outputs"]
+    from fpdf import FPDF
+
+    with telemetry.span("pdf.render") as span:
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        pdf.multi_cell(0, 10, clean_text(f"Project Summary\nDate: {datetime.datetime.now().strftime('%Y-%m-%d')}\nProject: {project['project_name']}\nLocation: {project['location']}\nPower Type: {', '.join(project['power_type'])}\nInfrastructure Type: {', '.join(project['infra_type'])}\nObjectives: {', '.join(project['strategic_objectives'])}\nPartners: {project['known_partners']}"))
+        pdf.ln(5)
+        pdf.multi_cell(0, 10, clean_text(f"Agent 1 Output:\n{outputs['agent_1']}"))
+        pdf.add_page()
+        pdf.multi_cell(0, 10, clean_text(f"Agent 2 Risk Summary:\n{outputs['agent_2']}"))
+        pdf.add_page()
+        pdf.multi_cell(0, 10, clean_text(f"Agent 3 Mitigation Plan:\n{outputs['agent_3']}"))
+        # Rendered in memory and stored with the job, so concurrent runs can't overwrite each other's report
+        # and nothing accumulates in the working directory (fpdf 1.x returns the document as a latin-1 str)
+        data = pdf.output(dest="S").encode("latin1")
+        span.count(bytes=len(data))
+    job.put_artifact("report.pdf", data)
+    return {
+        "filename": f"{project['project_name'].replace(' ', '_')}_AI_Plan.pdf",
+        "size": len(data),
+        "render_ms": round(span.seconds * 1000, 1),
+    }
+
+# For the download button: each job's report is read from the job table once per server
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_report(job_id):
+    return job_queue.get_artifact(job_id, "report.pdf")
+
+def send_email_stage(job):
+    project_name = job.payload["project"]["project_name"]
+    report = job.results["pdf"]
+    msg = report_message(
+        EMAIL_SENDER, job.payload["user_email"], f"AI Project Review: {project_name}",
+        clean_text(f"Hello {job.payload['user_name']},\n\nAttached is your full AI analysis for the project: {project_name}."),
+        attachment=job.get_artifact("report.pdf"), attachment_name=report["filename"], cc=EMAIL_RECIPIENT,
+    )
+    # Keyed by job so a retry waits on the message already queued or sent instead of emailing it twice;
+    # no overall timeout, as each delivery attempt is bounded by the SMTP socket timeout
+    mail_delivery.send(msg, key=job.id)
+    return {"to": job.payload["user_email"], "cc": EMAIL_RECIPIENT}
+
+@st.cache_resource
+def load_job_queue():
+    jobs = JobQueue(max_workers=int(st.secrets.get("JOB_WORKERS", 2)))
+    jobs.register("analysis", [
+        JobStage("agents", run_agents_stage, retries=1),
+        JobStage("pdf", render_pdf_stage, retries=2),
+        JobStage("email", send_email_stage, retries=3, backoff=5.0),
+    ])
+    jobs.prune(float(st.secrets.get("JOB_RETENTION_DAYS", 7)))
+    jobs.recover()
+    return jobs
+
+job_queue = load_job_queue()
+
+with st.sidebar.expander("Jobs"):
+    st.table([job_queue.counts()])
+    st.table([mail_delivery.stats()])
+
+if st.button("Run Full Agent Analysis"):
+    st.session_state["analysis_job"] = job_queue.submit("analysis", {
+        "project": {
+            "project_name": project_name,
+            "location": location,
+            "power_type": power_type,
+            "infra_type": infra_type,
+            "strategic_objectives": strategic_objectives,
+            "anticipated_risks": anticipated_risks,
+            "timeline_constraints": timeline_constraints,
+            "known_partners": known_partners,
+        },
+        "user_name": user_name,
+        "user_email": user_email,
+        "similar_prompts": similar_prompts,
+        "bypass_cache": bypass_cache,
+    })
+
+def show_agent_outputs(job):
+    outputs = job["results"].get("agents", {}).get("outputs")
+    for agent, title in AGENT_TITLES.items():
+        st.markdown(f"### {title}")
+        if outputs:
+            st.markdown(outputs[agent])
+        elif job["progress"].get("streamed", {}).get(agent):
+            st.markdown(job["progress"]["streamed"][agent] + "▌")
+    for message in job["progress"].get("warnings", []):
+        st.warning(message)
+    return outputs
+
+# Redrawn every JOB_POLL_INTERVAL while the job runs, without holding up the script run;
+# once the job finishes the whole page reruns to show the results and stop polling
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def follow_job(job_id):
+    job = job_queue.get(job_id)
+    show_agent_outputs(job)
+    if job["status"] in ("done", "failed"):
+        st.rerun()
+    st.info(f"Job {job['status']}: {job['stage'] or 'waiting for a worker'}...")
+
+# The job runs in the worker pool; this script run only polls it, and picks it up again after a rerun
+job_id = st.session_state.get("analysis_job")
+job = job_queue.get(job_id) if job_id else None
+if job is not None and job["status"] not in ("done", "failed"):
+    follow_job(job_id)
+elif job is not None:
+    outputs = show_agent_outputs(job)
+    if outputs:
+        agent_result = job["results"]["agents"]
+        with st.expander("Stage timings"):
+            st.table([
+                {"Stage": name, "Started (s)": f"{t['start']:.2f}", "Duration (s)": f"{t['seconds']:.2f}"}
+                for name, t in agent_result["timings"].items()
+            ] + [
+                {"Stage": name, "Started (s)": "", "Duration (s)": f"{info.get('seconds', 0):.2f}"}
+                for name, info in job["stages"].items() if name != "agents"
+            ])
+
+        with st.expander("Prompt tokens"):
+            st.table([{"Agent": agent, **agent_result["prompt_tokens"].get(agent, {})} for agent in AGENT_TITLES])
+
+    report = job["results"].get("pdf")
+    if report:
+        st.caption(f"Report rendered in {report['render_ms']:.0f} ms ({report['size'] / 1024:.0f} KiB)")
+        st.download_button("Download PDF", file_name=report["filename"], data=load_report(job_id), mime="application/pdf")
+
+    if job["status"] == "failed":
+        failed = job["stage"]
+        info = job["stages"].get(failed) or {}
+        if info.get("error"):
+            st.error(f"The {failed} step failed after {info['attempts']} attempts: {info['error']}")
+        else:
+            st.error(f"The job failed: {(job['error'] or 'unknown error').strip().splitlines()[-1]}")
+        if st.button(f"Retry from the {failed} step" if failed else "Retry"):
+            job_queue.retry(job_id)
+            st.rerun()
+    else:
+        st.success("PDF emailed to stakeholder!")
+        st.markdown("### ✅ Submission Complete")
+        st.markdown(f"Thanks, **{job['payload']['user_name']}**! A copy of your AI-generated project review has been emailed to you and logged for internal review.")
@@ -0,0 +1,75 @@
+# MailDelivery against the local SMTP sink: connection reuse, reconnect on a dropped connection,
+# and no resend of a message the server refused.
+#   python -m pytest tests/test_mailer.py
+
+import os
+import smtplib
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.smtp_sink import SmtpSink
+from smr_pipeline.mailer import MailDelivery, SmtpSettings, report_message
+
+TIMEOUT = 10
+
+
+def message(to, subject="AI Project Review: Test"):
+    return report_message("sender@example.com", to, subject, "Hello,\n\nAttached.", attachment=b"%PDF-1.4 test",
+                          attachment_name="Test_AI_Plan.pdf")
+
+
+@pytest.fixture
+def sink():
+    sink = SmtpSink(refuse={"nobody@example.com"}).start()
+    yield sink
+    sink.shutdown()
+    sink.server_close()
+
+
+@pytest.fixture
+def delivery(sink):
+    delivery = MailDelivery(SmtpSettings("127.0.0.1", sink.port, starttls=False, timeout=TIMEOUT))
+    yield delivery
+    delivery.close()
+
+
+def test_messages_share_one_connection(sink, delivery):
+    futures = [delivery.submit(message(f"user{i}@example.com", f"Report {i}")) for i in range(5)]
+    for future in futures:
+        future.result(TIMEOUT)
+    assert [m["subject"] for m in sink.messages] == [f"Report {i}" for i in range(5)]
+    assert sink.connections == 1
+    assert delivery.stats()["connects"] == 1
+
+
+def test_dropped_connection_reconnects_and_resends_once(sink, delivery):
+    delivery.send(message("user@example.com", "Before"), timeout=TIMEOUT)
+    sink.drop_connections()
+    delivery.send(message("user@example.com", "After"), timeout=TIMEOUT)
+    assert [m["subject"] for m in sink.messages] == ["Before", "After"]
+    assert sink.connections == 2
+    assert delivery.reconnects == 1
+    assert delivery.sent == 2
+
+
+def test_refused_recipient_fails_without_resend(sink, delivery):
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        delivery.send(message("nobody@example.com"), timeout=TIMEOUT)
+    assert sink.messages == []
+    assert sink.transactions == 1
+    assert delivery.reconnects == 0
+    assert delivery.failed == 1
+    # The connection stays usable for the next message
+    delivery.send(message("user@example.com", "Next"), timeout=TIMEOUT)
+    assert [m["subject"] for m in sink.messages] == ["Next"]
+    assert sink.connections == 1
+
+
+def test_resubmitting_a_key_does_not_resend(sink, delivery):
+    first = delivery.submit(message("user@example.com"), key="job-1")
+    assert delivery.submit(message("user@example.com"), key="job-1") is first
+    first.result(TIMEOUT)
+    delivery.send(message("user@example.com"), timeout=TIMEOUT, key="job-1")
+    assert len(sink.messages) == 1